@@ -0,0 +1,184 @@
+"""各阶段的基准测试：加载数据、生成人生、绘图、编码
+
+python benchmarks/bench.py -o bench.json
+python benchmarks/bench.py --compare bench.json
+
+使用固定的种子，每个阶段先预热一次，再计时 repeat 次，另用 tracemalloc 单独
+运行一次记录 Python 分配的内存峰值（不包括 Pillow 图像缓冲区）
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Optional
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import PIL
+
+from nonebot_plugin_remake.data import GameData, data_path
+from nonebot_plugin_remake.drawer import (
+    draw_life,
+    draw_results,
+    draw_title,
+    talent_cache,
+    upscale,
+)
+from nonebot_plugin_remake.encoder import EncoderOptions, encode
+from nonebot_plugin_remake.life import Life, LifeRecord
+from nonebot_plugin_remake.snapshot import load_raw_data
+
+# 81 年的普通人生，和活到 500 岁的人生
+SHORT_LIFE = LifeRecord(4, (1028, 1031, 1081), (2, 8, 8, 2))
+LONG_LIFE = LifeRecord(41, (1135, 1048, 1064), (1, 0, 14, 13))
+
+
+@dataclass
+class Stage:
+    name: str
+    func: Callable[[Any], Any]
+    setup: Callable[[], Any] = lambda: None  # 不计时，返回值作为 func 的参数
+    loops: int = 1  # 每次计时调用 func 的次数，结果按单次调用计算
+
+
+def played(record: LifeRecord) -> tuple:
+    """draw_life 的参数"""
+    life = Life.from_record(record)
+    init_prop = life.get_property()
+    results = list(life.run())
+    return life.talent.talents, init_prop, results, life.gen_summary()
+
+
+def build_stages(cold: bool = False) -> list[Stage]:
+    tmp_dir = Path(tempfile.mkdtemp())
+    short_args = played(SHORT_LIFE)
+    long_args = played(LONG_LIFE)
+    short_img = draw_life(*short_args)
+    long_img = draw_life(*long_args)
+
+    def draw_setup():
+        # 默认测量缓存命中后的绘图，cold 时每次绘图前清空缓存
+        if cold:
+            talent_cache.clear()
+            draw_title.cache_clear()
+
+    def rand_talents(life: Life):
+        return list(life.talent.rand_talents(10))
+
+    return [
+        Stage(
+            "load_json",
+            lambda _: load_raw_data(data_path, tmp_dir / "missing.snapshot"),
+            setup=lambda: (tmp_dir / "missing.snapshot").unlink(missing_ok=True),
+        ),
+        Stage("load", lambda _: GameData.load()),
+        Stage("rand_talents", rand_talents, lambda: Life(seed=0), loops=1000),
+        Stage(
+            "run_short",
+            lambda life: list(life.run()),
+            lambda: Life.from_record(SHORT_LIFE),
+        ),
+        Stage(
+            "run_long",
+            lambda life: list(life.run()),
+            lambda: Life.from_record(LONG_LIFE),
+        ),
+        Stage("draw_results_short", lambda _: draw_results(short_args[2]), draw_setup),
+        Stage("draw_results_long", lambda _: draw_results(long_args[2]), draw_setup),
+        Stage("draw_life_short", lambda _: draw_life(*short_args), draw_setup),
+        Stage("draw_life_long", lambda _: draw_life(*long_args), draw_setup),
+        Stage(
+            "draw_life_long_x3",
+            lambda _: upscale(draw_life(*long_args, scale=3), 3),
+            draw_setup,
+        ),
+        Stage("save_jpg_short", lambda _: encode(short_img, EncoderOptions())),
+        Stage("save_jpg_long", lambda _: encode(long_img, EncoderOptions())),
+        Stage("save_png_short", lambda _: encode(short_img, EncoderOptions("png"))),
+        Stage("save_png_long", lambda _: encode(long_img, EncoderOptions("png"))),
+        Stage(
+            "save_jpg_1mb_long",
+            lambda _: encode(long_img, EncoderOptions(max_bytes=1024 * 1024)),
+        ),
+    ]
+
+
+def run_stage(stage: Stage, repeat: int) -> dict:
+    stage.func(stage.setup())  # 预热，加载字体等
+    times: list[float] = []
+    for _ in range(repeat):
+        arg = stage.setup()
+        begin = time.perf_counter()
+        for _ in range(stage.loops):
+            stage.func(arg)
+        times.append((time.perf_counter() - begin) / stage.loops)
+
+    arg = stage.setup()
+    tracemalloc.start()
+    stage.func(arg)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "repeat": repeat,
+        "loops": stage.loops,
+        "min_ms": round(min(times) * 1000, 4),
+        "median_ms": round(statistics.median(times) * 1000, 4),
+        "mean_ms": round(statistics.fmean(times) * 1000, 4),
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def compare(old: dict, new: dict):
+    print(f"\n{'stage':<20}{'old ms':>12}{'new ms':>12}{'ratio':>8}")
+    for name, item in new["stages"].items():
+        if name not in old["stages"]:
+            continue
+        old_ms = old["stages"][name]["median_ms"]
+        new_ms = item["median_ms"]
+        print(f"{name:<20}{old_ms:>12.3f}{new_ms:>12.3f}{new_ms / old_ms:>8.2f}")
+
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(description="人生重开各阶段基准测试")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="每个阶段计时次数")
+    parser.add_argument(
+        "-k", "--filter", default="", help="只运行名称包含该字符串的阶段"
+    )
+    parser.add_argument("--cold", action="store_true", help="绘图前清空缓存")
+    parser.add_argument("-o", "--output", type=Path, help="写入 JSON 结果的文件")
+    parser.add_argument("--compare", type=Path, help="与之前的 JSON 结果比较")
+    args = parser.parse_args(argv)
+
+    result: dict = {
+        "python": platform.python_version(),
+        "pillow": PIL.__version__,
+        "platform": platform.platform(),
+        "stages": {},
+    }
+    for stage in build_stages(args.cold):
+        if args.filter not in stage.name:
+            continue
+        item = run_stage(stage, args.repeat)
+        result["stages"][stage.name] = item
+        print(
+            f"{stage.name:<20}median {item['median_ms']:>10.3f} ms  "
+            f"min {item['min_ms']:>10.3f} ms  peak {item['peak_kb']:>10.1f} KiB"
+        )
+
+    if args.output:
+        args.output.write_text(json.dumps(result, indent=2), encoding="utf8")
+    if args.compare:
+        compare(json.loads(args.compare.read_text(encoding="utf8")), result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""检查按前缀和选取事件与原来逐个减去权重的做法选取结果相同
+
+python benchmarks/check_sampler.py --trials 40 --seed 0
+
+对每个年龄，随机生成满足条件的事件掩码（包括全部满足和全部不满足），
+把同一个 [0, 1) 内的随机数分别交给原来的逐个相减和 sampler.choose /
+choose_masked，比较选出的事件。对每个随机数选取结果都相同，两者的分布也就相同
+
+另外检查恰好落在累积权重边界上的随机数：权重不是整数时，逐个相减和累加的
+舍入误差不同，目标值与累积权重相差几个 ulp 以内时可能选到相邻的事件
+（中间隔着权重为 0 的事件时不相邻），
+原来的做法在接近 1 时还可能减完所有权重仍大于 0，回退到第一个事件；
+这样的随机数只占 1e-15 量级，单独统计。随机数选取不同，或者边界上选到
+累积权重不同的事件时返回非零值
+"""
+
+import argparse
+import random
+import sys
+from itertools import accumulate
+from pathlib import Path
+from typing import Optional
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from nonebot_plugin_remake.age import AgeEvents
+from nonebot_plugin_remake.data import GameData
+from nonebot_plugin_remake.sampler import choose, choose_masked
+
+# 每个年龄随机掩码中事件满足条件的概率，1 即全部满足
+PASS_RATES = (0.0, 0.1, 0.5, 0.9, 1.0)
+
+
+def subtract_scan(age_events: AgeEvents, checked: list[int], rnd: float) -> int:
+    """原来的 Event.rand_event：逐个减去满足条件的事件的权重，直到不大于 0
+
+    返回事件在该年龄中的下标，下同
+    """
+    weights = age_events.weights
+    rnd *= sum(weights[i] for i in checked)
+    for i in checked:
+        rnd -= weights[i]
+        if rnd <= 0:
+            return i
+    return 0
+
+
+def prefix_choose(age_events: AgeEvents, checked: list[int], rnd: float) -> int:
+    """与 Event.rand_event 相同，全部满足条件时使用预先计算的前缀和"""
+    _, weights, cum_weights = age_events
+    if not checked:
+        return 0
+    if len(checked) == len(weights):
+        return choose(cum_weights, rnd)
+    return choose_masked(weights, checked, rnd)
+
+
+def boundaries(age_events: AgeEvents, checked: list[int]) -> list[float]:
+    """恰好使某个累积权重等于目标值的随机数，以及 0 和最接近 1 的数"""
+    weights = [age_events.weights[i] for i in checked]
+    total = sum(weights)
+    result = [0.0, 1 - sys.float_info.epsilon / 2]
+    acc = 0.0
+    for weight in weights:
+        acc += weight
+        result.append(acc / total)
+    return [rnd for rnd in result if rnd < 1]
+
+
+def rounding_tie(
+    age_events: AgeEvents, checked: list[int], rnd: float, old: int, new: int
+) -> bool:
+    """目标值与两者之间的累积权重都只差舍入误差，即中间的事件权重都接近 0；
+    或者原来的做法减完所有权重后回退到第一个事件，前缀和选到最后一个
+    权重不为 0 的事件
+    """
+    cum_weights = list(accumulate(age_events.weights[i] for i in checked))
+    total = cum_weights[-1]
+    target = rnd * total
+    tolerance = 1e-9 * total
+    if old == 0 and total - target <= tolerance:
+        return total - cum_weights[checked.index(new)] <= tolerance
+    a, b = sorted((checked.index(old), checked.index(new)))
+    return (
+        abs(target - cum_weights[a]) <= tolerance
+        and abs(target - cum_weights[b - 1]) <= tolerance
+    )
+
+
+def check(trials: int, seed: int) -> int:
+    rng = random.Random(seed)
+    ages = GameData.load().ages
+    draws = 0
+    probes = 0
+    ties = 0
+    failures = 0
+    for age in sorted(ages.index):
+        age_events = ages.get_events(age)
+        count = len(age_events.event_ids)
+        for rate in PASS_RATES:
+            for _ in range(trials):
+                checked = [i for i in range(count) if rng.random() < rate]
+                rnd = rng.random()
+                draws += 1
+                old = subtract_scan(age_events, checked, rnd)
+                new = prefix_choose(age_events, checked, rnd)
+                if old != new:
+                    failures += 1
+                    print(f"age {age} rnd {rnd!r}: scan {old}, prefix {new}")
+                if not checked or rng.random() >= 0.1:
+                    continue
+                for rnd in boundaries(age_events, checked):
+                    probes += 1
+                    old = subtract_scan(age_events, checked, rnd)
+                    new = prefix_choose(age_events, checked, rnd)
+                    if old == new:
+                        continue
+                    if rounding_tie(age_events, checked, rnd, old, new):
+                        ties += 1
+                    else:
+                        failures += 1
+                        print(f"age {age} boundary {rnd!r}: scan {old}, prefix {new}")
+    print(
+        f"{draws} random draws and {probes} boundary probes over "
+        f"{len(ages.index)} ages: {failures} mismatches, "
+        f"{ties} rounding ties on boundaries"
+    )
+    return failures
+
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(description="检查事件选取与原来的做法相同")
+    parser.add_argument(
+        "--trials", type=int, default=40, help="每个年龄每种掩码比例的次数"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    args = parser.parse_args(argv)
+    if args.trials <= 0:
+        parser.error("--trials must be positive")
+    sys.exit(1 if check(args.trials, args.seed) else 0)
+
+
+if __name__ == "__main__":
+    main()
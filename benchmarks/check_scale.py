@@ -0,0 +1,71 @@
+"""检查 remake_render_scale 的取值范围，以及范围内的每个缩放都能正常绘制
+
+python benchmarks/check_scale.py
+
+配置应当拒绝 0 和大于 MAX_SCALE 的值；对允许的每个缩放，用 bench.py 中的两个
+人生逐页绘制并放大，放大后的尺寸与原尺寸相差不超过 TOLERANCE。有任何一项
+不满足时返回非零值
+"""
+
+import argparse
+import sys
+from pathlib import Path
+from typing import Optional
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from bench import LONG_LIFE, SHORT_LIFE, played
+from pydantic import ValidationError
+
+from nonebot_plugin_remake.config import Config
+from nonebot_plugin_remake.drawer import draw_life_pages, upscale
+
+MAX_SCALE = 4
+TOLERANCE = 0.05  # 各处尺寸分别取整，放大后与原尺寸略有差别
+
+
+def accepts(scale: int) -> bool:
+    try:
+        Config(remake_render_scale=scale)
+    except ValidationError:
+        return False
+    return True
+
+
+def check() -> int:
+    failures = 0
+    for scale in (0, MAX_SCALE + 1, 80):
+        if accepts(scale):
+            failures += 1
+            print(f"scale {scale}: accepted by config")
+    for name, record in (("short", SHORT_LIFE), ("long", LONG_LIFE)):
+        args = played(record)
+        expected = [page.size for page in draw_life_pages(*args)]
+        for scale in range(1, MAX_SCALE + 1):
+            if not accepts(scale):
+                failures += 1
+                print(f"scale {scale}: rejected by config")
+            sizes = [
+                upscale(page, scale).size
+                for page in draw_life_pages(*args, scale=scale)
+            ]
+            if len(sizes) != len(expected) or any(
+                abs(a - b) > b * TOLERANCE
+                for size, base in zip(sizes, expected)
+                for a, b in zip(size, base)
+            ):
+                failures += 1
+                print(f"{name} life scale {scale}: {sizes}, expected {expected}")
+            else:
+                print(f"{name} life scale {scale}: {sizes}")
+    print(f"{failures} failures")
+    return failures
+
+
+def main(argv: Optional[list[str]] = None):
+    argparse.ArgumentParser(description="检查绘图缩放的取值范围").parse_args(argv)
+    sys.exit(1 if check() else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+"""并发压测：模拟大量用户同时触发人生重开，统计从命令到发出图片的延迟
+
+python benchmarks/loadtest.py --users 10,50,100 --dialog 0.5
+
+需要安装 bench 依赖组中的 nonebot-adapter-onebot（poetry install --with bench）。
+使用 OneBot V11 的事件和消息段，Bot 的 API 调用不发出请求，只记录发送的消息；
+每个用户按自己收到的消息完成对话（选择天赋、分配属性），或直接发送“随机人生”。
+
+同时记录事件循环的延迟、run_sync 使用的 anyio 线程池和绘图执行器的占用和
+排队数量；绘图执行器繁忙时被拒绝的用户单独统计。插件配置可以通过环境变量
+设置，如 REMAKE_RENDER_WORKERS=4
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import re
+import statistics
+import sys
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Optional
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import nonebot
+
+nonebot.init(driver="~none", log_level="WARNING")
+
+import anyio.to_thread
+from nonebot.adapters.onebot.v11 import Adapter, Bot, Message, PrivateMessageEvent
+from nonebot.adapters.onebot.v11.event import Sender
+from nonebot.drivers import Driver
+from nonebot.message import handle_event
+
+nonebot.load_plugin("nonebot_plugin_remake")
+
+from nonebot_plugin_remake.plugin import BUSY_MESSAGE, render_executor
+
+SELF_ID = "10000"
+# 消息 id 全局唯一，alconna 按消息 id 缓存解析结果
+message_ids = itertools.count(1)
+
+
+@dataclass
+class Outbox:
+    """发给某个用户的消息"""
+
+    texts: asyncio.Queue = field(default_factory=asyncio.Queue)
+    image: asyncio.Event = field(default_factory=asyncio.Event)
+
+
+class FakeBot(Bot):
+    """不连接协议端，发送消息时交给对应用户的 Outbox"""
+
+    def __init__(self, adapter: Adapter, latency: float):
+        super().__init__(adapter, SELF_ID)
+        self.latency = latency
+        self.outboxes: dict[int, Outbox] = {}
+        self.message_id = 0
+
+    async def call_api(self, api: str, **data: Any) -> Any:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if api in ("send_msg", "send_private_msg"):
+            outbox = self.outboxes[int(data["user_id"])]
+            message = Message(data["message"])
+            if any(seg.type in ("image", "file") for seg in message):
+                outbox.image.set()
+            else:
+                outbox.texts.put_nowait(message.extract_plain_text())
+        self.message_id += 1
+        return {"message_id": self.message_id}
+
+
+class Sampler:
+    """定时采样事件循环延迟和线程池状态"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.loop_lag: list[float] = []
+        self.threads_busy: list[int] = []
+        self.threads_waiting: list[int] = []
+        self.render_running: list[int] = []
+        self.render_waiting: list[int] = []
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        limiter = anyio.to_thread.current_default_thread_limiter()
+        while True:
+            begin = loop.time()
+            await asyncio.sleep(self.interval)
+            self.loop_lag.append(loop.time() - begin - self.interval)
+            stats = limiter.statistics()
+            self.threads_busy.append(stats.borrowed_tokens)
+            self.threads_waiting.append(stats.tasks_waiting)
+            self.render_running.append(render_executor.running)
+            self.render_waiting.append(render_executor.waiting)
+
+
+def percentiles(values: list[float], scale: float = 1000) -> dict[str, float]:
+    if not values:
+        return {}
+    if len(values) == 1:
+        values = values * 2
+    q = statistics.quantiles(values, n=100, method="inclusive")
+    return {
+        "p50": round(q[49] * scale, 1),
+        "p95": round(q[94] * scale, 1),
+        "p99": round(q[98] * scale, 1),
+        "max": round(max(values) * scale, 1),
+    }
+
+
+class User:
+    def __init__(self, bot: FakeBot, user_id: int, dialog: bool):
+        self.bot = bot
+        self.user_id = user_id
+        self.dialog = dialog
+        self.outbox = bot.outboxes[user_id] = Outbox()
+
+    def post(self, text: str):
+        event = PrivateMessageEvent(
+            time=int(time.time()),
+            self_id=int(SELF_ID),
+            post_type="message",
+            sub_type="friend",
+            user_id=self.user_id,
+            message_type="private",
+            message_id=next(message_ids),
+            message=Message(text),
+            original_message=Message(text),
+            raw_message=text,
+            font=0,
+            sender=Sender(user_id=self.user_id),
+            to_me=True,
+        )
+        # 与适配器相同，每个事件单独处理，对话中的后续消息才能被等待中的会话收到
+        asyncio.create_task(handle_event(self.bot, event))
+
+    async def expect(self, pattern: str) -> str:
+        while True:
+            text = await self.outbox.texts.get()
+            if re.search(pattern, text):
+                return text
+
+    async def wait_image(self) -> bool:
+        """等待图片，收到繁忙的回复时返回 False"""
+        image = asyncio.ensure_future(self.outbox.image.wait())
+        busy = asyncio.ensure_future(self.expect(BUSY_MESSAGE))
+        done, pending = await asyncio.wait(
+            (image, busy), return_when=asyncio.FIRST_COMPLETED
+        )
+        for task in pending:
+            task.cancel()
+        return image in done
+
+    async def run(self) -> Optional[float]:
+        """返回收到第一张图片的耗时，被拒绝时返回 None"""
+        begin = time.perf_counter()
+        if self.dialog:
+            self.post("/remake")
+            if (
+                await self.expect(f"请发送编号选择3个天赋|{BUSY_MESSAGE}")
+                == BUSY_MESSAGE
+            ):
+                return None
+            self.post("0 1 2")
+            text = await self.expect(r"可用属性点为(\d+)")
+            total = int(re.search(r"可用属性点为(\d+)", text).group(1))  # type: ignore
+            if 0 <= total <= 40:
+                nums = [total // 4 + (i < total % 4) for i in range(4)]
+                self.post(" ".join(map(str, nums)))
+            else:
+                self.post("随机")
+        else:
+            self.post("/随机人生")
+        if not await self.wait_image():
+            return None
+        return time.perf_counter() - begin
+
+
+async def run_level(
+    bot: FakeBot, users: int, dialog: float, ramp: float, timeout: float
+) -> dict:
+    rng = random.Random(users)
+    sampler = Sampler()
+    sampler_task = asyncio.create_task(sampler.run())
+
+    async def start_user(i: int) -> tuple[bool, Optional[float], bool]:
+        """返回是否完整对话、耗时和是否被拒绝"""
+        await asyncio.sleep(rng.random() * ramp)
+        user = User(bot, 100000 + users * 1000 + i, rng.random() < dialog)
+        try:
+            latency = await asyncio.wait_for(user.run(), timeout)
+        except asyncio.TimeoutError:
+            return user.dialog, None, False
+        return user.dialog, latency, latency is None
+
+    begin = time.perf_counter()
+    results = await asyncio.gather(*(start_user(i) for i in range(users)))
+    elapsed = time.perf_counter() - begin
+    sampler_task.cancel()
+
+    latencies = [t for _, t, _ in results if t is not None]
+    rejected = sum(r for _, _, r in results)
+    return {
+        "users": users,
+        "completed": len(latencies),
+        "rejected": rejected,
+        "timeouts": users - len(latencies) - rejected,
+        "seconds": round(elapsed, 2),
+        "throughput": round(len(latencies) / elapsed, 2),
+        "latency_ms": percentiles(latencies),
+        "random_latency_ms": percentiles([t for d, t, _ in results if t and not d]),
+        "dialog_latency_ms": percentiles([t for d, t, _ in results if t and d]),
+        "loop_lag_ms": percentiles(sampler.loop_lag),
+        "threads_busy_max": max(sampler.threads_busy, default=0),
+        "threads_waiting_max": max(sampler.threads_waiting, default=0),
+        "threads_waiting_mean": round(
+            statistics.fmean(sampler.threads_waiting or [0]), 2
+        ),
+        "render_running_max": max(sampler.render_running, default=0),
+        "render_waiting_max": max(sampler.render_waiting, default=0),
+    }
+
+
+def print_level(result: dict):
+    def fmt(item: dict) -> str:
+        return " ".join(f"{k} {v:.0f}" for k, v in item.items()) or "-"
+
+    print(
+        f"\n{result['users']} users: {result['completed']} done, "
+        f"{result['rejected']} rejected as busy, "
+        f"{result['timeouts']} timed out in {result['seconds']}s "
+        f"({result['throughput']}/s)"
+    )
+    print(f"  latency ms        {fmt(result['latency_ms'])}")
+    print(f"  random ms         {fmt(result['random_latency_ms'])}")
+    print(f"  dialog ms         {fmt(result['dialog_latency_ms'])}")
+    print(f"  loop lag ms       {fmt(result['loop_lag_ms'])}")
+    print(
+        f"  thread pool       busy max {result['threads_busy_max']}, "
+        f"waiting max {result['threads_waiting_max']}, "
+        f"mean {result['threads_waiting_mean']}"
+    )
+    print(
+        f"  render executor   running max {result['render_running_max']}, "
+        f"waiting max {result['render_waiting_max']}"
+    )
+
+
+@asynccontextmanager
+async def running(driver: Driver, bot: Bot) -> AsyncIterator[None]:
+    """不调用 nonebot.run()，手动执行启动和关闭钩子，并连接和断开 bot
+
+    压测脚本中只有这里使用 NoneBot 的私有接口 Driver._lifespan 和
+    Driver._bot_connect / _bot_disconnect，在 nonebot2 2.3.0 和 2.5.0 上检查过
+    """
+    await driver._lifespan.startup()
+    driver._bot_connect(bot)
+    try:
+        yield
+    finally:
+        driver._bot_disconnect(bot)
+        await driver._lifespan.shutdown()
+
+
+async def main_async(args: argparse.Namespace) -> list[dict]:
+    driver = nonebot.get_driver()
+    bot = FakeBot(Adapter(driver), args.api_latency / 1000)
+    results = []
+    async with running(driver, bot):
+        for users in args.users:
+            result = await run_level(bot, users, args.dialog, args.ramp, args.timeout)
+            results.append(result)
+            if not args.json:
+                print_level(result)
+    return results
+
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(description="人生重开并发压测")
+    parser.add_argument(
+        "--users",
+        type=lambda s: [int(x) for x in s.split(",")],
+        default=[10, 50],
+        help="并发用户数，多个以逗号分隔依次测试",
+    )
+    parser.add_argument("--dialog", type=float, default=0.5, help="完整对话的用户比例")
+    parser.add_argument("--ramp", type=float, default=2, help="用户在多少秒内陆续到达")
+    parser.add_argument("--timeout", type=float, default=600, help="单个用户超时秒数")
+    parser.add_argument("--api-latency", type=float, default=0, help="API 调用延迟毫秒")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(main_async(args))
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,71 @@
-import json
-from pathlib import Path
+import sys
+from array import array
+from typing import NamedTuple
 
-from .event import WeightedEvent
-from .property import Property
+from .property import Property, compile_effect
+from .sampler import prefix_sums
+
+
+class AgeEvents(NamedTuple):
+    """某一年龄可能发生的事件，两列一一对应"""
+
+    event_ids: memoryview
+    weights: memoryview
+    cum_weights: memoryview  # 权重的前缀和
+
+
+class AgeTable:
+    """按年龄连续存放的事件表，所有年龄共用一个事件 id 数组和一个权重数组"""
+
+    def __init__(self, ages: dict[int, tuple[array, array]]):
+        self.index: dict[int, int] = {}
+        self.offsets = array("i", [0])
+        self.event_ids = array("i")
+        self.weights = array("d")
+        self.cum_weights = array("d")
+        for age in sorted(ages):
+            ids, weights = ages[age]
+            self.index[age] = len(self.index)
+            self.event_ids.extend(ids)
+            self.weights.extend(weights)
+            self.cum_weights.extend(prefix_sums(weights))
+            self.offsets.append(len(self.event_ids))
+        self._event_ids = memoryview(self.event_ids)
+        self._weights = memoryview(self.weights)
+        self._cum_weights = memoryview(self.cum_weights)
+
+    def __contains__(self, age: int) -> bool:
+        return age in self.index
+
+    def get_events(self, age: int) -> AgeEvents:
+        i = self.index[age]
+        start = self.offsets[i]
+        end = self.offsets[i + 1]
+        return AgeEvents(
+            self._event_ids[start:end],
+            self._weights[start:end],
+            self._cum_weights[start:end],
+        )
+
+    @property
+    def nbytes(self) -> int:
+        """数组和索引占用的内存"""
+        arrays = (self.offsets, self.event_ids, self.weights, self.cum_weights)
+        return sum(sys.getsizeof(a) for a in (*arrays, self.index)) + sum(
+            sys.getsizeof(k) + sys.getsizeof(v) for k, v in self.index.items()
+        )
+
+
+GROW = compile_effect({"AGE": 1})
 
 
 class AgeManager:
-    def __init__(self, prop: Property):
+    def __init__(self, prop: Property, ages: AgeTable):
         self.prop = prop
-        self.ages: dict[int, list[WeightedEvent]] = {}
-
-    def load(self, path: Path):
-        data: dict[str, dict] = json.load(path.open("r", encoding="utf8"))
-        self.ages = {
-            int(k): [WeightedEvent(s) for s in v.get("event", [])]
-            for k, v in data.items()
-        }
+        self.ages = ages
 
-    def get_events(self) -> list[WeightedEvent]:
-        return self.ages[self.prop.AGE]
+    def get_events(self) -> AgeEvents:
+        return self.ages.get_events(self.prop.AGE)
 
     def grow(self):
-        self.prop.AGE += 1
+        self.prop.apply(GROW)
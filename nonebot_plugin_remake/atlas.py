@@ -0,0 +1,124 @@
+"""字形图集：每个字号的每个字只用 FreeType 渲染一次，之后拼接字形绘制文字
+
+像素字体没有字距调整，字形不超出各自的整数步进宽度，逐字拼接与 FreeType
+整行渲染的结果逐像素相同；含有不满足条件的字形时回退到 FreeType 绘制
+"""
+
+import threading
+from typing import NamedTuple, Optional, Union
+
+from PIL import Image, ImageDraw
+from PIL.Image import Image as IMG
+from PIL.ImageFont import FreeTypeFont
+
+
+class Glyph(NamedTuple):
+    mask: Optional[IMG]  # 灰度字形，空白字符为 None
+    x: int  # 字形左上角相对于笔位置的偏移
+    y: int
+    advance: int
+    fits: bool  # 步进为整数且字形在步进宽度内，可以直接拼接
+
+
+class GlyphAtlas:
+    """单个字号的字形图集，线程安全
+
+    提供与 FreeTypeFont.getmetrics、getlength 和 ImageDraw.text 结果相同的接口
+    """
+
+    def __init__(self, font: FreeTypeFont):
+        self.font = font  # FreeType 字体对象不能并发使用，只在持有锁时使用
+        self.lock = threading.Lock()
+        self.glyphs: dict[str, Glyph] = {}
+        # 与 ImageDraw.multiline_text 相同，行距为 "A" 的底部加上 spacing
+        self.line_height = int(font.getbbox("A")[3])
+        self.metrics = font.getmetrics()
+
+    def glyph(self, char: str) -> Glyph:
+        if (glyph := self.glyphs.get(char)) is None:
+            with self.lock:
+                if (glyph := self.glyphs.get(char)) is None:
+                    glyph = self.render(char)
+                    self.glyphs[char] = glyph
+        return glyph
+
+    def render(self, char: str) -> Glyph:
+        advance = self.font.getlength(char)
+        # 像素字体的边界都是整数
+        x0, y0, x1, y1 = map(int, self.font.getbbox(char))
+        mask = None
+        if x1 > x0 and y1 > y0:
+            mask = Image.new("L", (x1 - x0, y1 - y0))
+            ImageDraw.Draw(mask).text((-x0, -y0), char, font=self.font, fill=255)
+        fits = advance == int(advance) and (mask is None or 0 <= x0 and x1 <= advance)
+        return Glyph(mask, x0, y0, int(advance), fits)
+
+    def getmetrics(self) -> tuple[int, int]:
+        return self.metrics
+
+    def advances(self, text: str) -> Optional[list[int]]:
+        """每个字的步进宽度，逐字相加等于整行宽度；有字形不能拼接时返回 None"""
+        glyphs = [self.glyph(char) for char in text]
+        if all(glyph.fits for glyph in glyphs):
+            return [glyph.advance for glyph in glyphs]
+        return None
+
+    def getlength(self, text: str) -> float:
+        glyphs = [self.glyph(char) for char in text]
+        if all(glyph.fits for glyph in glyphs):
+            return float(sum(glyph.advance for glyph in glyphs))
+        with self.lock:
+            return self.font.getlength(text)
+
+    def getmask(self, glyphs: list[Glyph]) -> Optional[tuple[IMG, int, int]]:
+        """拼接一行字形，返回灰度图和左上角相对于笔的偏移，没有可见字形时返回 None"""
+        placed: list[tuple[IMG, int, int]] = []
+        x = 0
+        for glyph in glyphs:
+            if glyph.mask:
+                placed.append((glyph.mask, x + glyph.x, glyph.y))
+            x += glyph.advance
+        if not placed:
+            return None
+
+        left = min(x for _, x, _ in placed)
+        top = min(y for _, _, y in placed)
+        right = max(x + mask.width for mask, x, _ in placed)
+        bottom = max(y + mask.height for mask, _, y in placed)
+        image = Image.new("L", (right - left, bottom - top))
+        for mask, x, y in placed:
+            image.paste(mask, (x - left, y - top))
+        return image, left, top
+
+    def draw_text(
+        self,
+        image: IMG,
+        xy: tuple[float, float],
+        text: str,
+        fill: Union[str, tuple[int, ...]],
+        spacing: int = 4,
+    ):
+        """在 image 上绘制文字，结果与 ImageDraw.text 相同"""
+        x, y = xy
+        lines = [[self.glyph(char) for char in line] for line in text.split("\n")]
+        if (
+            x != int(x)
+            or y != int(y)
+            or not all(glyph.fits for glyphs in lines for glyph in glyphs)
+        ):
+            with self.lock:
+                ImageDraw.Draw(image).text(
+                    xy, text, font=self.font, fill=fill, spacing=spacing
+                )
+            return
+
+        # 字形可能比行距高，与 ImageDraw 相同逐行绘制，相邻行重叠处依次混合
+        x, y = int(x), int(y)
+        for glyphs in lines:
+            if (result := self.getmask(glyphs)) is not None:
+                mask, left, top = result
+                left += x
+                top += y
+                box = (left, top, left + mask.width, top + mask.height)
+                image.paste(fill, box, mask)
+            y += self.line_height + spacing
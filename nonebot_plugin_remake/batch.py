@@ -0,0 +1,423 @@
+"""批量模拟：N 个人生按年同步推进，属性存放为数组，条件按列向量化求值
+
+与 Life 使用的随机数序列不同，单个人生的结果无法逐一对应，但分布一致
+"""
+
+from collections.abc import Sequence
+from dataclasses import dataclass
+from functools import cache
+from typing import Callable, Optional, Union
+
+try:
+    import numpy as np
+except ImportError as e:  # pragma: no cover
+    raise ImportError(
+        "simulate_batch requires numpy, "
+        "install it with `pip install nonebot-plugin-remake[simulate]`"
+    ) from e
+
+from .codegen import compile_function
+from .condition import (
+    ALWAYS,
+    COMPARE_OPS,
+    NEVER,
+    SET_ATTRS,
+    And,
+    Compare,
+    Condition,
+    Contains,
+    Node,
+)
+from .data import GameData, get_game_data
+from .property import RDM_ATTRS, SCALAR_ATTRS, SUMSummary, Effect
+
+# 与 Property.__init__ 中的初始值一致
+INITIAL_VALUES = {"AGE": -1, "SPR": 5, "LIF": 1, "TMS": 1}
+INITIAL_TOTAL = 20
+
+# 计算选取事件时每次处理的人生数，限制权重矩阵占用的内存
+SAMPLE_BLOCK = 4096
+
+# 参数为人生的下标数组，或表示全部人生的 slice(None)
+Mask = Callable[["BatchState", Union[np.ndarray, slice]], np.ndarray]
+
+
+class BitIndex:
+    """集合属性的位集布局：元素 -> (字下标, 位)"""
+
+    def __init__(self, items: Sequence[int]):
+        self.positions: dict[int, tuple[int, int]] = {
+            item: (i >> 6, 1 << (i & 63)) for i, item in enumerate(sorted(items))
+        }
+        self.words = max(1, (len(self.positions) + 63) >> 6)
+
+
+class BatchState:
+    """存活人生的属性，每个数值属性为一个数组，集合属性为 (人生数, 字数) 的位集"""
+
+    # 由 __init__ 按 SCALAR_ATTRS 和 SET_ATTRS 设置
+    AGE: np.ndarray
+    CHR: np.ndarray
+    INT: np.ndarray
+    STR: np.ndarray
+    MNY: np.ndarray
+    SPR: np.ndarray
+    LIF: np.ndarray
+    TMS: np.ndarray
+    TLT: np.ndarray
+    EVT: np.ndarray
+    AVT: np.ndarray
+
+    def __init__(self, n: int, layout: dict[str, BitIndex]):
+        for attr in SCALAR_ATTRS:
+            setattr(self, attr, np.full(n, INITIAL_VALUES.get(attr, 0), np.int64))
+        for attr in SET_ATTRS:
+            setattr(self, attr, np.zeros((n, layout[attr].words), np.uint64))
+        # 每个人生在结果中的下标
+        self.index = np.arange(n)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def take(self, rows: np.ndarray):
+        for attr in (*SCALAR_ATTRS, *SET_ATTRS, "index"):
+            setattr(self, attr, getattr(self, attr)[rows])
+
+
+def compile_mask(node: Node, layout: dict[str, BitIndex]) -> Mask:
+    """把条件编译为对一组人生求值的函数，返回布尔数组"""
+    consts: dict[str, object] = {
+        "_isin": np.isin,
+        "_ones": np.ones,
+        "_zeros": np.zeros,
+        "_bool": np.bool_,
+    }
+
+    def const(value: object) -> str:
+        name = f"_c{len(consts)}"
+        consts[name] = value
+        return name
+
+    def constant(value: bool) -> str:
+        return f"_{'ones' if value else 'zeros'}(x.index[r].shape, _bool)"
+
+    def gen(node: Node) -> str:
+        if isinstance(node, Compare):
+            return f"(x.{node.attr}[r] {COMPARE_OPS[node.op]} {node.value})"
+        if isinstance(node, Contains):
+            if node.attr not in SET_ATTRS:
+                values = const(np.array(sorted(node.values)))
+                return (
+                    f"({'~' if node.negate else ''}_isin(x.{node.attr}[r], {values}))"
+                )
+            bits: dict[int, int] = {}
+            for value in node.values:
+                if value in layout[node.attr].positions:
+                    word, bit = layout[node.attr].positions[value]
+                    bits[word] = bits.get(word, 0) | bit
+            if not bits:
+                # 没有任何条件读取的元素不会记入位集，结果恒定
+                return constant(node.negate)
+            tests = " | ".join(
+                f"(x.{node.attr}[r, {word}] & {const(np.uint64(bit))})"
+                for word, bit in bits.items()
+            )
+            return f"(({tests}) {'==' if node.negate else '!='} 0)"
+        if not node.items:
+            return constant(isinstance(node, And))
+        joiner = " & " if isinstance(node, And) else " | "
+        return "(" + joiner.join(gen(item) for item in node.items) + ")"
+
+    return compile_function(
+        f"lambda x, r: {gen(node)}",
+        "<batch condition>",
+        consts,
+        names=("x", "r"),
+        attrs={*SCALAR_ATTRS, *SET_ATTRS, "index", "shape"},
+    )
+
+
+class BatchEvent:
+    def __init__(
+        self,
+        include: Optional[Condition],
+        exclude: Optional[Condition],
+        effect: Effect,
+        branches: list[tuple[Condition, int]],
+        bit: Optional[tuple[int, int]],
+    ):
+        self.include = include  # None 表示总是满足
+        self.exclude = exclude  # None 表示从不排除
+        self.effect = effect
+        self.branches = branches
+        self.bit = bit  # 事件在 EVT 位集中的位置
+
+
+class BatchModel:
+    """由 GameData 预先编译的向量化事件表"""
+
+    def __init__(self, data: GameData):
+        self.data = data
+        conditions: set[Condition] = set()
+        for event in data.events.values():
+            conditions.update((event.include, event.exclude))
+            conditions.update(b.condition for b in event.branch)
+        for talents in data.talents.values():
+            conditions.update(t.condition for t in talents)
+
+        items: dict[str, set[int]] = {attr: set() for attr in SET_ATTRS}
+        for cond in conditions:
+            for dep in cond.deps:
+                if isinstance(dep, tuple):
+                    items[dep[0]].add(dep[1])
+        # 天赋发动后记入 TLT，以此判断天赋是否已经发动过
+        items["TLT"].update(data.talents_by_id)
+        self.layout = {attr: BitIndex(list(v)) for attr, v in items.items()}
+
+        self.masks: dict[Condition, Mask] = {
+            cond: compile_mask(cond.node, self.layout) for cond in conditions
+        }
+        self.events: dict[int, BatchEvent] = {}
+        self.event_index: dict[int, int] = {}
+        for event_id, event in data.events.items():
+            self.event_index[event_id] = len(self.event_index)
+            self.events[event_id] = BatchEvent(
+                None if event.include is ALWAYS else event.include,
+                None if event.exclude is NEVER else event.exclude,
+                event.effect,
+                [(b.condition, b.event_id) for b in event.branch],
+                self.layout["EVT"].positions.get(event_id),
+            )
+        self.no_random = {k for k, v in data.events.items() if v.no_random}
+
+        ages = data.ages
+        self.ages: dict[int, tuple[np.ndarray, np.ndarray]] = {}
+        for age, i in ages.index.items():
+            start, end = ages.offsets[i], ages.offsets[i + 1]
+            self.ages[age] = (
+                np.array(ages.event_ids[start:end], np.int64),
+                np.array(ages.weights[start:end], np.float64),
+            )
+
+
+@cache
+def get_batch_model(data: GameData) -> BatchModel:
+    return BatchModel(data)
+
+
+@dataclass
+class BatchResult:
+    ages: np.ndarray  # 每个人生的享年
+    sums: np.ndarray  # 每个人生的总评分数
+    event_hits: dict[int, int]  # 事件 id -> 发生次数，包括分支事件
+    talent_hits: dict[int, int]  # 天赋 id -> 发动过的人生数
+
+    @property
+    def lives(self) -> int:
+        return len(self.ages)
+
+    @property
+    def sum_grades(self) -> np.ndarray:
+        """每个人生的总评在 SUMSummary.grades() 中的下标"""
+        mins = np.array([g.min for g in SUMSummary(0).grades()])
+        return np.maximum(np.searchsorted(mins, self.sums, side="right") - 1, 0)
+
+
+class BatchRunner:
+    def __init__(
+        self,
+        model: BatchModel,
+        n: int,
+        talents: Sequence[int],
+        props: Optional[dict[str, int]],
+        rng: np.random.Generator,
+    ):
+        self.model = model
+        self.rng = rng
+        self.talents = [model.data.talents_by_id[i] for i in dict.fromkeys(talents)]
+        self.state = BatchState(n, model.layout)
+        self.ages = np.zeros(n, np.int64)
+        self.sums = np.zeros(n, np.int64)
+        self.event_hits = np.zeros(len(model.event_index), np.int64)
+        self.talent_hits = dict.fromkeys((t.id for t in self.talents), 0)
+        self.allocate(props)
+
+    def allocate(self, props: Optional[dict[str, int]]):
+        state = self.state
+        if props is not None:
+            for attr in ("CHR", "INT", "STR", "MNY"):
+                getattr(state, attr)[:] += props.get(attr, 0)
+            return
+        # 与随机人生相同的分配方式
+        total = INITIAL_TOTAL + sum(t.status for t in self.talents)
+        half_prop1 = int(total / 2)
+        half_prop2 = total - half_prop1
+        num1 = self.rng.integers(0, half_prop1, len(state), endpoint=True)
+        num2 = self.rng.integers(0, half_prop2, len(state), endpoint=True)
+        nums = np.stack([num1, num2, half_prop1 - num1, half_prop2 - num2], axis=1)
+        nums = self.rng.permuted(nums, axis=1)
+        for i, attr in enumerate(("CHR", "INT", "STR", "MNY")):
+            getattr(state, attr)[:] += nums[:, i]
+
+    def apply(self, effect: Effect, rows: np.ndarray):
+        state = self.state
+        for key, value in effect.items:
+            if key == "RDM":
+                choice = self.rng.integers(0, len(RDM_ATTRS), len(rows))
+                for i, attr in enumerate(RDM_ATTRS):
+                    getattr(state, attr)[rows[choice == i]] += value
+            else:
+                getattr(state, key)[rows] += value
+
+    def set_bit(self, attr: str, bit: tuple[int, int], rows: np.ndarray):
+        word, value = bit
+        getattr(self.state, attr)[rows, word] |= np.uint64(value)
+
+    def run(self):
+        state = self.state
+        while len(state):
+            dead = state.LIF <= 0
+            if dead.any():
+                self.record(np.flatnonzero(dead))
+                state.take(np.flatnonzero(~dead))
+                if not len(state):
+                    break
+            state.AGE += 1
+            for age, rows in self.group_by_age():
+                self.run_events(rows, self.rand_events(age, rows))
+            self.run_talents()
+
+    def record(self, rows: np.ndarray):
+        state = self.state
+        index = state.index[rows]
+        self.ages[index] = state.AGE[rows]
+        total = sum(getattr(state, attr)[rows] for attr in RDM_ATTRS)
+        self.sums[index] = total * 2 + state.AGE[rows] // 2
+
+    def group_by_age(self):
+        ages = self.state.AGE
+        if ages.min() == ages.max():
+            yield int(ages[0]), np.arange(len(ages))
+            return
+        values, inverse = np.unique(ages, return_inverse=True)
+        for i, age in enumerate(values):
+            yield int(age), np.flatnonzero(inverse == i)
+
+    def rand_events(self, age: int, rows: np.ndarray) -> np.ndarray:
+        model = self.model
+        event_ids, weights = model.ages[age]
+        r = slice(None) if len(rows) == len(self.state) else rows
+        cache: dict[Condition, np.ndarray] = {}
+
+        def check(cond: Condition) -> np.ndarray:
+            result = cache.get(cond)
+            if result is None:
+                result = cache[cond] = model.masks[cond](self.state, r)
+            return result
+
+        # 只保留至少在一个人生中满足条件的候选事件，第 j 行对应 event_ids[candidates[j]]
+        candidates: list[int] = []
+        rows_checked: list[np.ndarray] = []
+        for j, event_id in enumerate(event_ids.tolist()):
+            if event_id in model.no_random:
+                continue
+            event = model.events[event_id]
+            result = None
+            if event.include is not None:
+                result = check(event.include)
+            if event.exclude is not None:
+                excluded = check(event.exclude)
+                result = ~excluded if result is None else result & ~excluded
+            if result is None:
+                result = np.ones(len(rows), bool)
+            elif not result.any():
+                continue
+            candidates.append(j)
+            rows_checked.append(result)
+        if not candidates:
+            # 没有满足条件的事件时选取第一个事件
+            return np.full(len(rows), event_ids[0])
+
+        checked = np.stack(rows_checked)
+        candidate_weights = weights[candidates][:, None]
+        chosen = np.empty(len(rows), np.int64)
+        rnd = self.rng.random(len(rows))
+        for start in range(0, len(rows), SAMPLE_BLOCK):
+            block = slice(start, start + SAMPLE_BLOCK)
+            mask = checked[:, block]
+            cum_weights = mask * candidate_weights
+            # 逐行累加比 np.cumsum(axis=0) 快得多
+            for i in range(1, len(cum_weights)):
+                cum_weights[i] += cum_weights[i - 1]
+            target = rnd[block] * cum_weights[-1]
+            # 与 sampler.choose 相同：第一个累积权重不小于目标值的可选事件
+            found = (cum_weights >= target) & mask
+            chosen[block] = np.where(
+                found.any(axis=0), np.asarray(candidates)[found.argmax(axis=0)], 0
+            )
+        return event_ids[chosen]
+
+    def run_events(self, rows: np.ndarray, event_ids: np.ndarray):
+        model = self.model
+        while len(rows):
+            next_rows: list[np.ndarray] = []
+            next_ids: list[np.ndarray] = []
+            order = np.argsort(event_ids, kind="stable")
+            rows, event_ids = rows[order], event_ids[order]
+            ids, starts = np.unique(event_ids, return_index=True)
+            for event_id, group in zip(ids.tolist(), np.split(rows, starts[1:])):
+                event = model.events[event_id]
+                self.event_hits[model.event_index[event_id]] += len(group)
+                for cond, branch_id in event.branches:
+                    matched = model.masks[cond](self.state, group)
+                    if matched.any():
+                        branch_rows = group[matched]
+                        self.apply(event.effect, branch_rows)
+                        next_rows.append(branch_rows)
+                        next_ids.append(np.full(len(branch_rows), branch_id))
+                        group = group[~matched]
+                self.apply(event.effect, group)
+                if event.bit is not None:
+                    self.set_bit("EVT", event.bit, group)
+            rows = np.concatenate(next_rows) if next_rows else rows[:0]
+            event_ids = np.concatenate(next_ids) if next_ids else event_ids[:0]
+
+    def run_talents(self):
+        model = self.model
+        tlt = model.layout["TLT"].positions
+        for talent in self.talents:
+            word, bit = tlt[talent.id]
+            rows = np.flatnonzero((self.state.TLT[:, word] & np.uint64(bit)) == 0)
+            if talent.condition is not ALWAYS:
+                rows = rows[model.masks[talent.condition](self.state, rows)]
+            if len(rows):
+                self.apply(talent.effect, rows)
+                self.set_bit("TLT", (word, bit), rows)
+                self.talent_hits[talent.id] += len(rows)
+
+    def result(self) -> BatchResult:
+        ids = list(self.model.event_index)
+        return BatchResult(
+            self.ages,
+            self.sums,
+            {ids[i]: int(c) for i, c in enumerate(self.event_hits.tolist()) if c},
+            self.talent_hits,
+        )
+
+
+def simulate_batch(
+    n: int,
+    talents: Sequence[int] = (),
+    props: Optional[dict[str, int]] = None,
+    seed: Optional[int] = None,
+    data: Optional[GameData] = None,
+) -> BatchResult:
+    """同时模拟 n 个人生
+
+    talents 为所有人生共同拥有的天赋 id；props 为 "CHR"、"INT"、"STR"、"MNY"
+    的属性分配，不指定时每个人生按随机人生的方式随机分配
+    """
+    model = get_batch_model(data or get_game_data())
+    runner = BatchRunner(model, n, talents, props, np.random.default_rng(seed))
+    runner.run()
+    return runner.result()
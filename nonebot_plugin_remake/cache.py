@@ -0,0 +1,78 @@
+import threading
+from collections import OrderedDict
+from collections.abc import Hashable
+from typing import Callable, Generic, NamedTuple, Optional, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class CacheStats(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    entries: int
+    nbytes: int
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class LRUCache(Generic[K, V]):
+    """同时按条目数和字节数限制大小的 LRU 缓存，线程安全"""
+
+    def __init__(self, max_entries: int, max_bytes: int, sizeof: Callable[[V], int]):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.data: OrderedDict[K, tuple[V, int]] = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key: K) -> Optional[V]:
+        with self.lock:
+            item = self.data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self.data.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key: K, value: V):
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            if (old := self.data.pop(key, None)) is not None:
+                self.nbytes -= old[1]
+            self.data[key] = (value, size)
+            self.nbytes += size
+            while len(self.data) > self.max_entries or self.nbytes > self.max_bytes:
+                _, (_, old_size) = self.data.popitem(last=False)
+                self.nbytes -= old_size
+                self.evictions += 1
+
+    def get_or_create(self, key: K, factory: Callable[[], V]) -> V:
+        """不存在时调用 factory 生成，生成过程不持有锁，并发时可能重复生成"""
+        value = self.get(key)
+        if value is None:
+            value = factory()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+            self.nbytes = 0
+
+    def stats(self) -> CacheStats:
+        with self.lock:
+            return CacheStats(
+                self.hits, self.misses, self.evictions, len(self.data), self.nbytes
+            )
@@ -0,0 +1,56 @@
+"""把条件和效果编译为 Python 函数，单个人生和批量模拟共用
+
+生成的源码只能由关键字、整数、运算符、参数名、命名空间中的名字和允许的属性名
+组成，编译前逐个检查词法单元；数据中的其他值（集合、数组等）都通过命名空间传入。
+执行时没有内置函数，用到的函数同样通过命名空间传入
+"""
+
+import re
+from collections.abc import Collection
+from typing import Any, Callable
+
+KEYWORDS = frozenset(
+    {"and", "def", "in", "lambda", "not", "or", "pass", "True", "False"}
+)
+reg_token = re.compile(
+    r"(?P<name>[A-Za-z_]\w*)|(?P<num>\d+)|'(?P<str>\w*)'|(?P<dot>\.)"
+    r"|(?P<op>[-+*<>=!&|~(),:\[\]]+)|(?P<space>\s+)|(?P<other>.)"
+)
+
+
+def check_source(source: str, names: Collection[str], attrs: Collection[str]):
+    """源码中有不允许的词法单元时抛出 ValueError
+
+    names 为可以使用的名字，attrs 为可以访问的属性名，也可以作为字符串出现
+    """
+    after_dot = False
+    for match in reg_token.finditer(source):
+        kind, text = match.lastgroup, match.group()
+        if kind == "name":
+            allowed = text in attrs if after_dot else text in KEYWORDS or text in names
+        elif kind == "str":
+            allowed = match.group("str") in attrs
+        else:
+            allowed = kind != "other" and not (after_dot and kind != "name")
+        if not allowed:
+            raise ValueError(f"unexpected {text!r} in generated source: {source}")
+        after_dot = kind == "dot"
+
+
+def compile_function(
+    source: str,
+    filename: str,
+    namespace: dict[str, Any],
+    names: Collection[str] = ("x",),
+    attrs: Collection[str] = (),
+) -> Callable[..., Any]:
+    """检查并编译 lambda 表达式，或者名为 f 的函数定义
+
+    names 为参数和局部变量名，namespace 为函数可以使用的全局名字
+    """
+    check_source(source, {"f", *names, *namespace}, attrs)
+    scope = {"__builtins__": {}, **namespace}
+    if source.startswith("lambda"):
+        return eval(compile(source, filename, "eval"), scope)
+    exec(compile(source, filename, "exec"), scope)
+    return scope["f"]
@@ -0,0 +1,216 @@
+import re
+from collections.abc import Hashable, Iterator
+from functools import cache
+from typing import Callable, NamedTuple, Union
+
+from nonebot.log import logger
+
+from .codegen import compile_function
+from .property import Property
+
+# 条件语法：
+#   expr    := term ("|" term)*
+#   term    := factor ("&" factor)*
+#   factor  := "(" expr ")" | ATTR OP NUMBER | ATTR ("?" | "!") "[" NUMBERS "]"
+#   NUMBERS := NUMBER ("," NUMBER)*
+# 例如 "(EVT?[10009])&(STR<3)"、"AGE?[20]"、"TLT![1022]"
+
+SCALAR_ATTRS = frozenset({"AGE", "CHR", "INT", "STR", "MNY", "SPR", "LIF", "TMS"})
+SET_ATTRS = frozenset({"TLT", "EVT", "AVT"})
+ATTR_ALIASES = {"AEVT": "AVT"}
+
+COMPARE_OPS = {">": ">", "<": "<", ">=": ">=", "<=": "<=", "=": "==", "!=": "!="}
+
+reg_token = re.compile(
+    r"\s*(?:(?P<num>-?\d+)|(?P<attr>[A-Z]+)|(?P<op>>=|<=|!=|[<>=?!])|(?P<punct>[()\[\],&|]))"
+)
+
+
+class Compare(NamedTuple):
+    attr: str
+    op: str
+    value: int
+
+
+class Contains(NamedTuple):
+    attr: str
+    values: frozenset[int]
+    negate: bool  # "!" 表示不包含任何一个
+
+
+class And(NamedTuple):
+    items: tuple["Node", ...]
+
+
+class Or(NamedTuple):
+    items: tuple["Node", ...]
+
+
+Node = Union[Compare, Contains, And, Or]
+
+
+class Condition:
+    """编译后的条件，按源字符串缓存复用"""
+
+    __slots__ = ("source", "node", "check", "deps", "rising", "falling")
+
+    def __init__(self, source: str, node: Node):
+        self.source = source
+        self.node = node
+        self.check: Callable[[Property], bool] = compile_node(node)
+        # 条件读取的属性，与 Property.changes 中的记录对应
+        self.deps: frozenset[Hashable] = frozenset(node_deps(node))
+        # TLT、EVT、AVT 只增不减，只由集合条件组成的条件结果是单调的
+        # rising：一旦为真则永远为真；falling：一旦为假则永远为假
+        self.rising, self.falling = node_monotonic(node)
+
+    def __call__(self, prop: Property) -> bool:
+        return self.check(prop)
+
+    def __repr__(self) -> str:
+        return f"Condition({self.source!r})"
+
+
+def tokenize(cond: str) -> Iterator[tuple[str, str]]:
+    pos = 0
+    cond = cond.rstrip()
+    while pos < len(cond):
+        matched = reg_token.match(cond, pos)
+        if not matched or matched.lastgroup is None:
+            raise ValueError(f"invalid condition {cond!r} at {pos}")
+        kind = matched.lastgroup
+        yield kind, matched.group(kind)
+        pos = matched.end()
+
+
+class Parser:
+    def __init__(self, cond: str):
+        self.cond = cond
+        self.tokens = list(tokenize(cond))
+        self.pos = 0
+
+    def peek(self) -> tuple[str, str]:
+        if self.pos < len(self.tokens):
+            return self.tokens[self.pos]
+        return "end", ""
+
+    def next(self, kind: str, value: str = "") -> str:
+        tok_kind, tok_value = self.peek()
+        if tok_kind != kind or (value and tok_value != value):
+            raise ValueError(
+                f"expected {value or kind} in condition {self.cond!r}, "
+                f"got {tok_value or tok_kind!r}"
+            )
+        self.pos += 1
+        return tok_value
+
+    def parse(self) -> Node:
+        node = self.parse_expr()
+        if self.peek()[0] != "end":
+            raise ValueError(f"unexpected {self.peek()[1]!r} in {self.cond!r}")
+        return node
+
+    def parse_expr(self) -> Node:
+        items = [self.parse_term()]
+        while self.peek() == ("punct", "|"):
+            self.pos += 1
+            items.append(self.parse_term())
+        return items[0] if len(items) == 1 else Or(tuple(items))
+
+    def parse_term(self) -> Node:
+        items = [self.parse_factor()]
+        while self.peek() == ("punct", "&"):
+            self.pos += 1
+            items.append(self.parse_factor())
+        return items[0] if len(items) == 1 else And(tuple(items))
+
+    def parse_factor(self) -> Node:
+        if self.peek() == ("punct", "("):
+            self.pos += 1
+            node = self.parse_expr()
+            if self.peek()[0] == "end":
+                logger.warning(f"[WARNING] missing ) in {self.cond}")
+            else:
+                self.next("punct", ")")
+            return node
+
+        attr = self.next("attr")
+        attr = ATTR_ALIASES.get(attr, attr)
+        if attr not in SCALAR_ATTRS and attr not in SET_ATTRS:
+            raise ValueError(f"unknown attribute {attr!r} in {self.cond!r}")
+        op = self.next("op")
+        if op in ("?", "!"):
+            self.next("punct", "[")
+            values = [int(self.next("num"))]
+            while self.peek() == ("punct", ","):
+                self.pos += 1
+                values.append(int(self.next("num")))
+            self.next("punct", "]")
+            return Contains(attr, frozenset(values), op == "!")
+        if attr in SET_ATTRS:
+            raise ValueError(f"cannot compare set attribute {attr!r} in {self.cond!r}")
+        return Compare(attr, op, int(self.next("num")))
+
+
+def node_deps(node: Node) -> Iterator[Hashable]:
+    if isinstance(node, Compare):
+        yield node.attr
+    elif isinstance(node, Contains):
+        if node.attr in SET_ATTRS:
+            for value in node.values:
+                yield node.attr, value
+        else:
+            yield node.attr
+    else:
+        for item in node.items:
+            yield from node_deps(item)
+
+
+def node_monotonic(node: Node) -> tuple[bool, bool]:
+    if isinstance(node, Compare):
+        return False, False
+    if isinstance(node, Contains):
+        if node.attr not in SET_ATTRS:
+            return False, False
+        return not node.negate, node.negate
+    results = [node_monotonic(item) for item in node.items]
+    return all(r for r, _ in results), all(f for _, f in results)
+
+
+def compile_node(node: Node) -> Callable[[Property], bool]:
+    consts: dict[str, frozenset[int]] = {}
+
+    def gen(node: Node) -> str:
+        if isinstance(node, Compare):
+            return f"x.{node.attr} {COMPARE_OPS[node.op]} {node.value}"
+        if isinstance(node, Contains):
+            if node.attr in SET_ATTRS and len(node.values) == 1:
+                (value,) = node.values
+                return f"{value} {'not in' if node.negate else 'in'} x.{node.attr}"
+            name = f"_c{len(consts)}"
+            consts[name] = node.values
+            if node.attr in SET_ATTRS:
+                return (
+                    f"{'' if node.negate else 'not '}x.{node.attr}.isdisjoint({name})"
+                )
+            return f"x.{node.attr} {'not in' if node.negate else 'in'} {name}"
+        if not node.items:
+            return "True" if isinstance(node, And) else "False"
+        joiner = " and " if isinstance(node, And) else " or "
+        return "(" + joiner.join(gen(item) for item in node.items) + ")"
+
+    return compile_function(
+        f"lambda x: {gen(node)}",
+        "<condition>",
+        consts,
+        attrs=SCALAR_ATTRS | SET_ATTRS | {"isdisjoint"},
+    )
+
+
+ALWAYS = Condition("", And(()))
+NEVER = Condition("", Or(()))
+
+
+@cache
+def parse_condition(cond: str) -> Condition:
+    return Condition(cond, Parser(cond).parse())
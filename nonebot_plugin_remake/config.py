@@ -0,0 +1,24 @@
+from typing import Literal
+
+from pydantic import BaseModel, Field
+
+
+class Config(BaseModel):
+    remake_warm_up: bool = False  # 启动时预先绘制所有天赋卡片，约占用 50MB 内存
+    remake_render_scale: int = Field(default=1, ge=1, le=4)  # 按 1/scale 的尺寸绘制
+    remake_upscale: bool = True  # 缩小绘制后是否用最近邻插值放大回原尺寸
+    remake_memory_budget: int = Field(default=0, ge=0)  # 单张图片的内存上限，MB
+    remake_progressive: bool = False  # 边模拟边绘制，每页一列，绘制好一页就发送
+    # 绘图使用的专用线程池或进程池，最多同时绘制的人生数和排队数，超出时回复繁忙
+    remake_render_executor: Literal["thread", "process"] = "thread"
+    remake_render_workers: int = Field(default=2, ge=1)
+    remake_render_queue: int = Field(default=8, ge=0)
+    remake_replay_max_users: int = Field(default=10000, ge=1)  # 保存记录的用户数
+    # 图片的编码格式和参数，max_size 为单张图片的大小上限，KB
+    remake_image_format: Literal["jpeg", "webp", "png"] = "jpeg"
+    remake_image_quality: int = Field(default=75, ge=1, le=100)
+    remake_jpeg_subsampling: Literal["4:4:4", "4:2:2", "4:2:0"] = "4:2:0"
+    remake_jpeg_progressive: bool = False
+    remake_webp_method: int = Field(default=4, ge=0, le=6)
+    remake_png_colors: int = Field(default=256, ge=2, le=256)
+    remake_image_max_size: int = Field(default=0, ge=0)
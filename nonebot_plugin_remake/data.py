@@ -0,0 +1,41 @@
+from collections.abc import Hashable
+from dataclasses import dataclass
+from functools import cache, cached_property
+from pathlib import Path
+
+from .age import AgeTable
+from .event import Event, event_dependents, load_events
+from .snapshot import load_raw_data
+from .talent import Talent, load_talents
+
+data_path = Path(__file__).parent / "resources" / "data"
+
+
+@dataclass(frozen=True, eq=False)
+class GameData:
+    """只读的游戏数据，由所有人生共享"""
+
+    ages: AgeTable
+    events: dict[int, Event]
+    event_dependents: dict[Hashable, tuple[int, ...]]
+    talents: dict[int, tuple[Talent, ...]]  # 按等级分组
+
+    @cached_property
+    def talents_by_id(self) -> dict[int, Talent]:
+        return {t.id: t for talents in self.talents.values() for t in talents}
+
+    @classmethod
+    def load(cls, path: Path = data_path) -> "GameData":
+        raw = load_raw_data(path)
+        events = load_events(raw["events"])
+        return cls(
+            ages=AgeTable(raw["ages"]),
+            events=events,
+            event_dependents=event_dependents(events),
+            talents=load_talents(raw["talents"]),
+        )
+
+
+@cache
+def get_game_data() -> GameData:
+    return GameData.load()
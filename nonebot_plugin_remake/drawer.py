@@ -1,12 +1,17 @@
+import threading
+from collections.abc import Callable, Iterable, Iterator
+from functools import cache, partial
 from io import BytesIO
 from pathlib import Path
-from typing import NamedTuple, Optional
+from typing import NamedTuple, Optional, Union
 
 from PIL import Image, ImageDraw, ImageFont
 from PIL.Image import Image as IMG
 from PIL.Image import Resampling
 from PIL.ImageFont import FreeTypeFont
 
+from .atlas import GlyphAtlas
+from .cache import LRUCache
 from .life import PerAgeProperty, PerAgeResult
 from .property import PropSummary, Summary
 from .talent import Talent
@@ -17,15 +22,79 @@ font_dir = resource_dir / "fonts"
 font_path = str(font_dir / "方正像素12.ttf")
 
 
+def px(value: float, scale: float) -> int:
+    """按 scale 缩小设计尺寸，scale 为 1 时即原始尺寸"""
+    return round(value / scale)
+
+
+@cache
+def font_bytes() -> bytes:
+    with open(font_path, "rb") as f:
+        return f.read()
+
+
+# FreeType 字体对象不能在线程间共享，每个线程各自缓存
+font_local = threading.local()
+
+
 def get_font(fontsize: int) -> FreeTypeFont:
-    return ImageFont.truetype(str(font_dir / "方正像素12.ttf"), fontsize)
+    fonts: dict[int, FreeTypeFont] = font_local.__dict__.setdefault("fonts", {})
+    font = fonts.get(fontsize)
+    if font is None:
+        font = ImageFont.truetype(BytesIO(font_bytes()), fontsize)
+        fonts[fontsize] = font
+    return font
+
+
+@cache
+def get_atlas(fontsize: int) -> GlyphAtlas:
+    """字形图集，所有线程共享，用于绘制不带描边的文字"""
+    return GlyphAtlas(ImageFont.truetype(BytesIO(font_bytes()), fontsize))
+
+
+images: dict[tuple[str, float], IMG] = {}
+images_lock = threading.Lock()
+
+
+def load_image(name: str, scale: float = 1) -> IMG:
+    """解码后缓存的图片，所有线程共享，不能修改，需要修改时先 copy()"""
+    if (image := images.get((name, scale))) is None:
+        base = None if scale == 1 else load_image(name)
+        with images_lock:
+            if (image := images.get((name, scale))) is None:
+                if base is None:
+                    image = Image.open(image_dir / name)
+                    image.load()
+                else:
+                    size = (px(base.width, scale), px(base.height, scale))
+                    image = base.resize(size, Resampling.LANCZOS)
+                images[(name, scale)] = image
+    return image
+
+
+def get_icon(item: str, scale: float = 1) -> IMG:
+    return load_image(f"icon_{item}.png", scale)
 
 
-def get_icon(item: str) -> IMG:
-    return Image.open(image_dir / f"icon_{item}.png")
+def break_text(text: str, font: GlyphAtlas, length: int) -> list[str]:
+    """按宽度逐字换行，用缓存的步进宽度累加行宽"""
+    if (advances := font.advances(text)) is None:
+        return break_text_slow(text, font, length)
+    lines = []
+    start = 0
+    width = 0
+    for i, advance in enumerate(advances):
+        if width + advance > length:
+            lines.append(text[start:i])
+            start = i
+            width = 0
+        width += advance
+    if start < len(text):
+        lines.append(text[start:])
+    return lines
 
 
-def break_text(text: str, font: FreeTypeFont, length: int) -> list[str]:
+def break_text_slow(text: str, font: GlyphAtlas, length: int) -> list[str]:
     lines = []
     line = ""
     for word in text:
@@ -38,46 +107,59 @@ def break_text(text: str, font: FreeTypeFont, length: int) -> list[str]:
     return lines
 
 
-def text_to_image(
+def image_nbytes(image: IMG) -> int:
+    return image.width * image.height * len(image.getbands())
+
+
+class TextBlock(NamedTuple):
+    lines: list[str]
+    width: int
+    height: int
+
+
+def measure_text(
     texts: list[str],
-    fontsize: int = 10,
-    fill: str = "black",
+    fontsize: int,
     spacing: int = 4,
     max_width: Optional[int] = None,
-) -> IMG:
-    font = get_font(fontsize)
-    texts = sum([text.splitlines() for text in texts], [])
+) -> TextBlock:
+    """计算换行后的各行和文字块的宽高，不绘制"""
+    atlas = get_atlas(fontsize)
+    lines = sum([text.splitlines() for text in texts], [])
     if max_width:
-        texts = sum([break_text(text, font, max_width) for text in texts], [])
-    max_length = int(max([font.getlength(text) for text in texts]))
-    ascent, descent = font.getmetrics()
-    h = ascent * len(texts) + spacing * (len(texts) - 1) + descent
-    image = Image.new("RGBA", (max_length, h))
-    draw = ImageDraw.Draw(image)
-    text = "\n".join(texts)
-    draw.multiline_text((0, 0), text, font=font, fill=fill, spacing=spacing)
-    return image
+        lines = sum([break_text(text, atlas, max_width) for text in lines], [])
+    width = int(max([atlas.getlength(line) for line in lines]))
+    ascent, descent = atlas.getmetrics()
+    height = ascent * len(lines) + spacing * (len(lines) - 1) + descent
+    return TextBlock(lines, width, height)
+
 
+def draw_init_properties(prop: PerAgeProperty, scale: float = 1) -> IMG:
+    s = partial(px, scale=scale)
 
-def draw_init_properties(prop: PerAgeProperty) -> IMG:
-    image = Image.new("RGBA", (1250, 84))
-    font = get_font(45)
+    image = Image.new("RGBA", (s(1250), s(84)))
+    font = get_atlas(s(45))
     draw = ImageDraw.Draw(image)
-    draw.rounded_rectangle((0, 0, image.width, image.height), 20, "#0A2530")
+    draw.rounded_rectangle((0, 0, image.width, image.height), s(20), "#0A2530")
     x = 0
 
     def draw_property(item: str, name: str, value: int):
         nonlocal x
-        icon = get_icon(item)
+        icon = get_icon(item, scale)
         image.paste(
-            icon, (x + (84 - icon.width) // 2, (84 - icon.height) // 2), mask=icon
+            icon,
+            (x + (s(84) - icon.width) // 2, (s(84) - icon.height) // 2),
+            mask=icon,
         )
-        draw.text((x + 84, 18), name, font=font, fill="white")
+        font.draw_text(image, (x + s(84), s(18)), name, fill="white")
         length = font.getlength(str(value))
-        draw.text(
-            (x + 170 + (80 - length) // 2, 18), str(value), font=font, fill="#53F8F8"
+        font.draw_text(
+            image,
+            (x + s(170) + (s(80) - length) // 2, s(18)),
+            str(value),
+            fill="#53F8F8",
         )
-        x += 250
+        x += s(250)
 
     draw_property("chr", "颜值", prop.CHR)
     draw_property("int", "智力", prop.INT)
@@ -87,23 +169,27 @@ def draw_init_properties(prop: PerAgeProperty) -> IMG:
     return image
 
 
-def draw_properties(prop: PerAgeProperty) -> IMG:
-    image = Image.new("RGBA", (670, 84))
+def draw_properties(prop: PerAgeProperty, scale: float = 1) -> IMG:
+    s = partial(px, scale=scale)
+
+    image = Image.new("RGBA", (s(670), s(84)))
     draw = ImageDraw.Draw(image)
-    draw.rounded_rectangle((0, 0, image.width, image.height), 20, "#153D4F")
-    font = get_font(45)
+    draw.rounded_rectangle((0, 0, image.width, image.height), s(20), "#153D4F")
+    font = get_atlas(s(45))
     x = 0
 
     def draw_property(item: str, value: int):
         nonlocal x
-        icon = get_icon(item)
+        icon = get_icon(item, scale)
         image.paste(
-            icon, (x + (84 - icon.width) // 2, (84 - icon.height) // 2), mask=icon
+            icon,
+            (x + (s(84) - icon.width) // 2, (s(84) - icon.height) // 2),
+            mask=icon,
         )
-        x += 84
+        x += s(84)
         w = font.getlength(str(value))
-        draw.text((x + (46 - w) // 2, 18), str(value), font=font, fill="#53F8F8")
-        x += 46
+        font.draw_text(image, (x + (s(46) - w) // 2, s(18)), str(value), "#53F8F8")
+        x += s(46)
 
     draw_property("chr", prop.CHR)
     draw_property("int", prop.INT)
@@ -113,125 +199,178 @@ def draw_properties(prop: PerAgeProperty) -> IMG:
     return image
 
 
-def draw_age(age: int) -> IMG:
-    return text_to_image([f"{age}岁："], fontsize=45, fill="#C3DE5A")
+def draw_result_properties(prop: PerAgeProperty, scale: float = 1) -> IMG:
+    """每年的属性条，为初始属性的 2/3 大小"""
+    if scale != 1:
+        # 缩小绘制时直接按 2/3 的尺寸绘制，不再缩放
+        return draw_properties(prop, scale * 3 / 2)
+    image = draw_properties(prop)
+    return image.resize(
+        (image.width * 2 // 3, image.height * 2 // 3), Resampling.LANCZOS
+    )
 
 
-def draw_logs(logs: list[str]) -> IMG:
-    return text_to_image(logs, fontsize=45, fill="#F0F2F3", spacing=30, max_width=1200)
+class YearLayout(NamedTuple):
+    result: PerAgeResult
+    prop: tuple[int, int]  # 属性条的宽高
+    age: TextBlock
+    logs: TextBlock
+    width: int
+    height: int
 
 
-def draw_results(results: list[PerAgeResult]) -> IMG:
-    margin_prop = 20
-    margin_logs = 50
+class ResultsLayout(NamedTuple):
+    columns: list[list[YearLayout]]
+    size: tuple[int, int]  # 包括边框的宽高
+    scale: float
 
-    class ImageResult(NamedTuple):
-        prop: IMG
-        age: IMG
-        logs: IMG
 
-        @property
-        def width(self) -> int:
-            return max(self.prop.width, self.age.width + self.logs.width)
+def measure_year(result: PerAgeResult, scale: float = 1) -> YearLayout:
+    """根据字体度量计算一年各部分的大小，不分配图像"""
 
-        @property
-        def height(self) -> int:
-            return (
-                self.prop.height + margin_prop + max(self.age.height, self.logs.height)
-            )
+    s = partial(px, scale=scale)
 
-    images: list[ImageResult] = []
-    for result in results:
-        image_prop = draw_properties(result.property)
-        image_prop = image_prop.resize(
-            (image_prop.width * 2 // 3, image_prop.height * 2 // 3), Resampling.LANCZOS
-        )
-        image_age = draw_age(result.property.AGE)
-        image_logs = draw_logs(result.event_log + result.talent_log)
-        images.append(ImageResult(image_prop, image_age, image_logs))
-
-    image_groups: list[list[ImageResult]] = []
-    max_height = 10000
-    sum_height = sum(image.height for image in images) + margin_logs * (len(images) - 1)
-    num_groups = (sum_height - 1) // max_height + 1
-    results_height = sum_height // num_groups
-    if num_groups > 1:
-        results_height += max(image.height for image in images)
-
-    img_h = 0
-    temp_images: list[ImageResult] = []
-    for image in images:
-        if img_h + image.height > results_height:
-            image_groups.append(temp_images)
-            temp_images = []
-            max_height = max(max_height, img_h - margin_logs)
-            img_h = 0
-        img_h += image.height + margin_logs
-        temp_images.append(image)
-    if temp_images:
-        image_groups.append(temp_images)
-        max_height = max(max_height, img_h - margin_logs)
-
-    margin_group = 100
-    img_w = sum(
-        max(image.width for image in image_group) for image_group in image_groups
-    ) + margin_group * (len(image_groups) - 1)
-    img_h = max(
-        sum(image.height for image in image_group)
-        + margin_logs * (len(image_group) - 1)
-        for image_group in image_groups
+    if scale == 1:
+        prop_size = (s(670) * 2 // 3, s(84) * 2 // 3)
+    else:
+        prop_size = (px(670, scale * 3 / 2), px(84, scale * 3 / 2))
+    age = measure_text([f"{result.property.AGE}岁："], s(45))
+    logs = measure_text(result.event_log + result.talent_log, s(45), s(30), s(1200))
+    width = max(prop_size[0], age.width + logs.width)
+    height = prop_size[1] + s(20) + max(age.height, logs.height)
+    return YearLayout(result, prop_size, age, logs, width, height)
+
+
+def measure_years(results: list[PerAgeResult], scale: float = 1) -> list[YearLayout]:
+    return [measure_year(result, scale) for result in results]
+
+
+def split_columns(years: list[YearLayout], scale: float = 1) -> list[list[YearLayout]]:
+    """总高度超过 max_height 时分为多列，各列高度接近"""
+    margin_logs = px(50, scale)
+    columns: list[list[YearLayout]] = []
+    max_height = px(10000, scale)
+    sum_height = sum(year.height for year in years) + margin_logs * (len(years) - 1)
+    num_columns = (sum_height - 1) // max_height + 1
+    column_height = sum_height // num_columns
+    if num_columns > 1:
+        column_height += max(year.height for year in years)
+
+    height = 0
+    column: list[YearLayout] = []
+    for year in years:
+        if height + year.height > column_height:
+            columns.append(column)
+            column = []
+            height = 0
+        height += year.height + margin_logs
+        column.append(year)
+    if column:
+        columns.append(column)
+    return columns
+
+
+def column_height(column: list[YearLayout], scale: float = 1) -> int:
+    return sum(year.height for year in column) + px(50, scale) * (len(column) - 1)
+
+
+def layout_results(columns: list[list[YearLayout]], scale: float = 1) -> ResultsLayout:
+    s = partial(px, scale=scale)
+
+    margin_column = s(100)
+    content_w = sum(max(year.width for year in column) for column in columns)
+    content_w += margin_column * (len(columns) - 1)
+    content_h = max(column_height(column, scale) for column in columns)
+    padding = s(50)
+    margin = s(6)
+    inner_w = max(content_w + padding * 2, s(1250))
+    inner_h = content_h + padding * 2
+    size = (inner_w + margin * 2, inner_h + margin * 2)
+    return ResultsLayout(columns, size, scale)
+
+
+def measure_results(results: list[PerAgeResult], scale: float = 1) -> ResultsLayout:
+    """根据字体度量计算人生经历各部分的位置，不分配图像"""
+    years = measure_years(results, scale)
+    return layout_results(split_columns(years, scale), scale)
+
+
+@cache
+def results_corners(scale: float) -> list[tuple[IMG, tuple[int, int]]]:
+    """边框四角的装饰，位置相对于右下角为负数"""
+    length = px(100, scale)
+    margin = px(6, scale)
+    rect = Image.new("RGBA", (length * 2, length * 2))
+    draw = ImageDraw.Draw(rect)
+    draw.rectangle((0, 0, rect.width, rect.height), outline="#267674", width=margin)
+    return [
+        (rect.crop((0, 0, length, length)), (0, 0)),
+        (rect.crop((length, 0, length * 2, length)), (-length, 0)),
+        (rect.crop((0, length, length, length * 2)), (0, -length)),
+        (rect.crop((length, length, length * 2, length * 2)), (-length, -length)),
+    ]
+
+
+def paint_results(canvas: IMG, xy: tuple[int, int], layout: ResultsLayout):
+    """按 measure_results 的结果直接在 canvas 上绘制人生经历"""
+    scale = layout.scale
+
+    s = partial(px, scale=scale)
+
+    x0, y0 = xy
+    width, height = layout.size
+    margin = s(6)
+    padding = s(50)
+    draw = ImageDraw.Draw(canvas)
+    draw.rectangle(
+        (x0 + margin, y0 + margin, x0 + width - margin - 1, y0 + height - margin - 1),
+        fill="#0A2530",
     )
-    img = Image.new("RGBA", (img_w, img_h))
-    x = 0
-    y = 0
-    for image_group in image_groups:
-        img_w = max(image.width for image in image_group)
-        age_w = max([image.age.width for image in image_group])
-        for image in image_group:
-            img.paste(image.prop, (x, y), mask=image.prop)
-            y += image.prop.height + margin_prop
-            img.paste(image.age, (x + age_w - image.age.width, y), mask=image.age)
-            img.paste(image.logs, (x + age_w, y), mask=image.logs)
-            y += max(image.logs.height, image.age.height) + margin_logs
-        x += img_w + margin_group
-        y = 0
-
-    padding = 50
-    inner_w = img.width + padding * 2
-    inner_h = img.height + padding * 2
-    inner_w = max(inner_w, 1250)
-    inner = Image.new("RGBA", (inner_w, inner_h), "#0A2530")
-    inner.paste(img, (padding, padding), mask=img)
-
-    margin = 6
-    border = Image.new("RGBA", (inner.width + margin * 2, inner.height + margin * 2))
-    draw = ImageDraw.Draw(border)
     draw.rectangle(
-        (margin, margin, border.width - margin, border.height - margin),
+        (x0 + margin, y0 + margin, x0 + width - margin, y0 + height - margin),
         outline="#267674",
-        width=2,
+        width=max(s(2), 1),
     )
+    for corner, (dx, dy) in results_corners(scale):
+        pos = (
+            x0 + (dx if dx >= 0 else width + dx),
+            y0 + (dy if dy >= 0 else height + dy),
+        )
+        canvas.paste(corner, pos, mask=corner)
+
+    font = get_atlas(s(45))
+    margin_prop = s(20)
+    margin_logs = s(50)
+    x = x0 + margin + padding
+    for column in layout.columns:
+        y = y0 + margin + padding
+        age_w = max(year.age.width for year in column)
+        for year in column:
+            prop = draw_result_properties(year.result.property, scale)
+            canvas.paste(prop, (x, y), mask=prop)
+            y += year.prop[1] + margin_prop
+            font.draw_text(
+                canvas,
+                (x + age_w - year.age.width, y),
+                "\n".join(year.age.lines),
+                fill="#C3DE5A",
+            )
+            font.draw_text(
+                canvas,
+                (x + age_w, y),
+                "\n".join(year.logs.lines),
+                fill="#F0F2F3",
+                spacing=s(30),
+            )
+            y += max(year.logs.height, year.age.height) + margin_logs
+        x += max(year.width for year in column) + s(100)
 
-    length = 100
-    rect = Image.new("RGBA", (length * 2, length * 2))
-    draw = ImageDraw.Draw(rect)
-    draw.rectangle((0, 0, rect.width, rect.height), outline="#267674", width=margin)
-    for crop_box, pos in (
-        ((0, 0, length, length), (0, 0)),
-        ((length, 0, length * 2, length), (border.width - length, 0)),
-        ((0, length, length, length * 2), (0, border.height - length)),
-        (
-            (length, length, length * 2, length * 2),
-            (border.width - length, border.height - length),
-        ),
-    ):
-        corner = rect.crop(crop_box)
-        border.paste(corner, pos, mask=corner)
-
-    frame = Image.new("RGBA", (border.width, border.height))
-    frame.paste(inner, (margin, margin), mask=inner)
-    frame.paste(border, (0, 0), mask=border)
-    return frame
+
+def draw_results(results: list[PerAgeResult], scale: float = 1) -> IMG:
+    layout = measure_results(results, scale)
+    image = Image.new("RGBA", layout.size)
+    paint_results(image, (0, 0), layout)
+    return image
 
 
 def grade_color(grade: int) -> str:
@@ -245,81 +384,88 @@ def grade_color(grade: int) -> str:
         return "#CACBCB"
 
 
-def draw_progress_bar(item: str, summary: PropSummary) -> IMG:
+def draw_progress_bar(item: str, summary: PropSummary, scale: float = 1) -> IMG:
+    s = partial(px, scale=scale)
+
     def draw_progress(value: int, color: str) -> IMG:
-        image = Image.new("RGBA", (770, 40))
+        image = Image.new("RGBA", (s(770), s(40)))
         draw = ImageDraw.Draw(image)
         draw.rectangle((0, 0, image.width, image.height), fill="#273D47")
         count = min(max(value, 0), 10)
         draw.rectangle((0, 0, image.width * count // 10, image.height), fill=color)
-        font = get_font(40)
+        font = get_font(s(40))
         length = font.getlength(str(value))
         draw.text(
             ((image.width - length) // 2, 0),
             str(value),
             font=font,
             fill=color,
-            stroke_width=2,
+            stroke_width=max(s(2), 1),
             stroke_fill="black",
         )
         return image
 
-    image = Image.new("RGBA", (1200, 84))
-    icon = get_icon(item)
-    image.paste(icon, ((84 - icon.width) // 2, (84 - icon.height) // 2), mask=icon)
-    draw = ImageDraw.Draw(image)
-    font = get_font(45)
-    draw.text((84, 18), summary.name, font=font, fill="white")
+    image = Image.new("RGBA", (s(1200), s(84)))
+    icon = get_icon(item, scale)
+    image.paste(
+        icon, ((s(84) - icon.width) // 2, (s(84) - icon.height) // 2), mask=icon
+    )
+    font = get_atlas(s(45))
+    font.draw_text(image, (s(84), s(18)), summary.name, fill="white")
     color = grade_color(summary.grade)
     progress = draw_progress(summary.value, color)
-    image.paste(progress, (200, (image.height - progress.height) // 2), mask=progress)
+    image.paste(
+        progress, (s(200), (image.height - progress.height) // 2), mask=progress
+    )
     judge = summary.judge
     length = font.getlength(judge)
-    draw.text(
-        (200 + progress.width + (230 - length) // 2, 18), judge, font=font, fill=color
+    font.draw_text(
+        image, (s(200) + progress.width + (s(230) - length) // 2, s(18)), judge, color
     )
     return image
 
 
-def draw_summary(summary: Summary) -> IMG:
+def draw_summary(summary: Summary, scale: float = 1) -> IMG:
+    s = partial(px, scale=scale)
+
     def draw_sum(prop_sum: PropSummary) -> IMG:
-        image = Image.new("RGBA", (1000, 84))
+        image = Image.new("RGBA", (s(1000), s(84)))
         draw = ImageDraw.Draw(image)
-        draw.rounded_rectangle((0, 0, 300, image.height), 20, "#153D4F")
-        font = get_font(45)
-        draw.text((20, 18), f"{prop_sum.name}：", font=font, fill="white")
+        draw.rounded_rectangle((0, 0, s(300), image.height), s(20), "#153D4F")
+        font = get_atlas(s(45))
+        font.draw_text(image, (s(20), s(18)), f"{prop_sum.name}：", fill="white")
         length = font.getlength(str(prop_sum.value))
-        draw.text(
-            (140 + (160 - length) // 2, 18),
+        font.draw_text(
+            image,
+            (s(140) + (s(160) - length) // 2, s(18)),
             str(prop_sum.value),
-            font=font,
-            fill="#53F8F8",
+            "#53F8F8",
         )
         color = grade_color(prop_sum.grade)
         length = font.getlength(prop_sum.judge)
-        draw.text(
-            (770 + (230 - length) // 2, 18), prop_sum.judge, font=font, fill=color
+        font.draw_text(
+            image, (s(770) + (s(230) - length) // 2, s(18)), prop_sum.judge, color
         )
         return image
 
-    inner = Image.new("RGBA", (1200, 650))
+    inner = Image.new("RGBA", (s(1200), s(650)))
     image_age = draw_sum(summary.AGE)
     image_sum = draw_sum(summary.SUM)
-    inner.paste(image_age, (200, 0), mask=image_age)
-    inner.paste(image_sum, (200, 110), mask=image_sum)
+    inner.paste(image_age, (s(200), 0), mask=image_age)
+    inner.paste(image_sum, (s(200), s(110)), mask=image_sum)
     progress_bars = [
-        draw_progress_bar("chr", summary.CHR),
-        draw_progress_bar("int", summary.INT),
-        draw_progress_bar("str", summary.STR),
-        draw_progress_bar("mny", summary.MNY),
-        draw_progress_bar("spr", summary.SPR),
+        draw_progress_bar("chr", summary.CHR, scale),
+        draw_progress_bar("int", summary.INT, scale),
+        draw_progress_bar("str", summary.STR, scale),
+        draw_progress_bar("mny", summary.MNY, scale),
+        draw_progress_bar("spr", summary.SPR, scale),
     ]
-    y = 230
+    y = s(230)
     for progress_bar in progress_bars:
         inner.paste(progress_bar, (0, y), mask=progress_bar)
         y += progress_bar.height
 
-    bg = Image.open(image_dir / "bg_summary.png")
+    bg = load_image("bg_summary.png", scale).copy()
     bg.paste(
         inner,
         ((bg.width - inner.width) // 2, (bg.height - inner.height) // 2),
@@ -328,42 +474,62 @@ def draw_summary(summary: Summary) -> IMG:
     return bg
 
 
-def draw_title(text: str) -> IMG:
-    titlebar = Image.open(image_dir / "titlebar.png")
-    font = get_font(50)
+TITLES = ("已选天赋", "初始属性", "人生经历", "人生总结")
+
+
+@cache
+def draw_title(text: str, scale: float = 1) -> IMG:
+    """返回的图片由缓存共享，不能修改"""
+
+    s = partial(px, scale=scale)
+
+    titlebar = load_image("titlebar.png", scale).copy()
+    font = get_atlas(s(50))
     length = font.getlength(text)
-    draw = ImageDraw.Draw(titlebar)
-    draw.text(
-        ((titlebar.width - length) // 2, 130),
-        text,
-        font=font,
-        fill="white",
+    font.draw_text(titlebar, ((titlebar.width - length) // 2, s(130)), text, "white")
+    left = load_image("title_left.png", scale)
+    right = load_image("title_right.png", scale)
+    titlebar.paste(
+        left,
+        (int((titlebar.width - length) / 2 - left.width - s(10)), s(140)),
+        mask=left,
     )
-    left = Image.open(image_dir / "title_left.png")
-    right = Image.open(image_dir / "title_right.png")
     titlebar.paste(
-        left, (int((titlebar.width - length) / 2 - left.width - 10), 140), mask=left
+        right, (int((titlebar.width + length) / 2 + s(10)), s(140)), mask=right
     )
-    titlebar.paste(right, (int((titlebar.width + length) / 2 + 10), 140), mask=right)
     return titlebar
 
 
-def draw_talent(talent: Talent) -> IMG:
-    bg = Image.open(image_dir / "bg_talent.png")
-    font = get_font(45)
-    draw = ImageDraw.Draw(bg)
-    draw.text((40, 50), talent.name, font=font, fill="white")
-    font = get_font(35)
-    text = "\n".join(break_text(talent.description, font, 300))
-    draw.multiline_text((40, 130), text, font=font, fill="#879A9E", spacing=10)
+# 天赋卡片，键为天赋名称、描述和缩小倍数
+talent_cache: LRUCache[tuple[str, str, float], IMG] = LRUCache(
+    max_entries=256, max_bytes=64 * 1024 * 1024, sizeof=image_nbytes
+)
+
+
+def draw_talent(talent: Talent, scale: float = 1) -> IMG:
+    """返回的图片可能由缓存共享，不能修改"""
+    return talent_cache.get_or_create(
+        (talent.name, talent.description, scale),
+        lambda: render_talent(talent, scale),
+    )
+
+
+def render_talent(talent: Talent, scale: float = 1) -> IMG:
+    s = partial(px, scale=scale)
+
+    bg = load_image("bg_talent.png", scale).copy()
+    get_atlas(s(45)).draw_text(bg, (s(40), s(50)), talent.name, fill="white")
+    font = get_atlas(s(35))
+    text = "\n".join(break_text(talent.description, font, s(300)))
+    font.draw_text(bg, (s(40), s(130)), text, fill="#879A9E", spacing=s(10))
     return bg
 
 
-def draw_talents(talents: list[Talent]) -> IMG:
-    talent_images = [draw_talent(t) for t in talents]
+def draw_talents(talents: list[Talent], scale: float = 1) -> IMG:
+    talent_images = [draw_talent(t, scale) for t in talents]
     talent_w = talent_images[0].width
     talent_h = talent_images[0].height
-    margin = 30
+    margin = px(30, scale)
     image = Image.new("RGBA", (talent_w * 3 + margin * 2, talent_h))
     x = 0
     for talent_image in talent_images:
@@ -372,34 +538,172 @@ def draw_talents(talents: list[Talent]) -> IMG:
     return image
 
 
+Section = Union[IMG, ResultsLayout]
+
+
+def frame_size(sections: list[Section], scale: float = 1) -> tuple[int, int]:
+    margin = px(50, scale)
+    img_w = max([section.size[0] for section in sections])
+    img_h = sum([section.size[1] for section in sections]) + px(100, scale)
+    return img_w + margin * 2, img_h + margin * 2
+
+
+def paint_sections(sections: list[Section], scale: float = 1) -> IMG:
+    """在同一张 RGB 图上依次绘制各部分，人生经历不经过中间图像"""
+    size = frame_size(sections, scale)
+    margin = px(50, scale)
+    img_w = size[0] - margin * 2
+    frame = Image.new("RGB", size, "#04131F")
+    y = margin
+    for section in sections:
+        width, height = section.size
+        x = margin + (img_w - width) // 2
+        if isinstance(section, ResultsLayout):
+            paint_results(frame, (x, y), section)
+        else:
+            frame.paste(section, (x, y), mask=section)
+        y += height
+    return frame
+
+
 def draw_life(
     talents: list[Talent],
     init_prop: PerAgeProperty,
     results: list[PerAgeResult],
     summary: Summary,
+    scale: float = 1,
 ) -> IMG:
-    images: list[IMG] = []
-    images.append(draw_title("已选天赋"))
-    images.append(draw_talents(talents))
-    images.append(draw_title("初始属性"))
-    images.append(draw_init_properties(init_prop))
-    images.append(draw_title("人生经历"))
-    images.append(draw_results(results))
-    images.append(draw_title("人生总结"))
-    images.append(draw_summary(summary))
-
-    img_w = max([image.width for image in images])
-    img_h = sum([image.height for image in images]) + 100
-    margin = 50
-    frame = Image.new("RGBA", (img_w + margin * 2, img_h + margin * 2), "#04131F")
-    y = margin
-    for image in images:
-        frame.paste(image, (margin + (img_w - image.width) // 2, y), mask=image)
-        y += image.height
-    return frame
+    """scale 大于 1 时按 1/scale 的尺寸排版和绘制，可再用 upscale 放大
+
+    先计算各部分的大小，再在同一张图上绘制
+    """
+    return next(draw_life_pages(talents, init_prop, results, summary, scale))
+
+
+def draw_header(
+    talents: list[Talent], init_prop: PerAgeProperty, scale: float = 1
+) -> list[Section]:
+    return [
+        draw_title(TITLES[0], scale),
+        draw_talents(talents, scale),
+        draw_title(TITLES[1], scale),
+        draw_init_properties(init_prop, scale),
+        draw_title(TITLES[2], scale),
+    ]
+
+
+def draw_footer(summary: Summary, scale: float = 1) -> list[Section]:
+    return [draw_title(TITLES[3], scale), draw_summary(summary, scale)]
 
 
-def save_jpg(img: IMG) -> BytesIO:
-    output = BytesIO()
-    img.convert("RGB").save(output, format="JPEG")
-    return output
+def draw_life_pages(
+    talents: list[Talent],
+    init_prop: PerAgeProperty,
+    results: list[PerAgeResult],
+    summary: Summary,
+    scale: float = 1,
+    max_bytes: int = 0,
+) -> Iterator[IMG]:
+    """逐页绘制，max_bytes 不为 0 且整张图超出时，按每页不超过 max_bytes 分页
+
+    每页在取出时才绘制，调用方处理完一页并释放后再取下一页，内存占用不超过一页
+    """
+    header = draw_header(talents, init_prop, scale)
+    footer = draw_footer(summary, scale)
+    years = measure_years(results, scale)
+    sections = [*header, layout_results(split_columns(years, scale), scale), *footer]
+    width, height = frame_size(sections, scale)
+    if not max_bytes or width * height * 3 <= max_bytes:
+        yield paint_sections(sections, scale)
+        return
+    for page in paginate(header, years, lambda: footer, scale, max_bytes):
+        yield paint_sections(page, scale)
+
+
+def stream_life_pages(
+    talents: list[Talent],
+    init_prop: PerAgeProperty,
+    results: Iterable[PerAgeResult],
+    summary: Callable[[], Summary],
+    scale: float = 1,
+    max_bytes: int = 0,
+) -> Iterator[IMG]:
+    """边模拟边绘制，每页一列，一页的年份排满后立即绘制这一页
+
+    results 可以是 Life.run() 生成器，summary 在 results 结束后才调用
+    """
+
+    def footer() -> list[Section]:
+        return draw_footer(summary(), scale)
+
+    header = draw_header(talents, init_prop, scale)
+    years = (measure_year(result, scale) for result in results)
+    for page in paginate(header, years, footer, scale, max_bytes):
+        yield paint_sections(page, scale)
+
+
+MAX_PAGES = 10  # 分页时最多的页数
+
+
+def paginate(
+    header: list[Section],
+    years: Iterable[YearLayout],
+    footer: Callable[[], list[Section]],
+    scale: float,
+    max_bytes: int,
+) -> Iterator[list[Section]]:
+    """把人生经历按年分为多页，每页一列；第一页带有开头部分，最后一页带有总结
+
+    每列的高度与不分页时相同，不超过 10000；max_bytes 不为 0 时每页不超过 max_bytes，
+    但不小于开头部分加一年的大小，否则每一年都是一页。最多 MAX_PAGES 页，
+    剩下的年份都放在最后一页，与不分页时一样分为多列
+    """
+    max_column = px(10000, scale)
+
+    def nbytes(sections: list[Section]) -> int:
+        width, height = frame_size(sections, scale)
+        return width * height * 3
+
+    def fits(sections: list[Section], column: list[YearLayout]) -> bool:
+        if column:
+            if column_height(column, scale) > max_column:
+                return False
+            sections = [*sections, layout_results([column], scale)]
+        return not max_bytes or nbytes(sections) <= max_bytes
+
+    sections = header
+    column: list[YearLayout] = []
+    pages = 0  # 已经分出的页数
+    for year in years:
+        if max_bytes and sections is header and not column:
+            max_bytes = max(
+                max_bytes, nbytes([*header, layout_results([[year]], scale)])
+            )
+        if column and pages < MAX_PAGES - 1 and not fits(sections, [*column, year]):
+            yield [*sections, layout_results([column], scale)]
+            pages += 1
+            sections = []
+            column = []
+        column.append(year)
+    if column:
+        sections = [*sections, layout_results(split_columns(column, scale), scale)]
+    tail = footer()
+    if sections and pages < MAX_PAGES - 1 and not fits([*sections, *tail], []):
+        yield sections
+        sections = []
+    yield [*sections, *tail]
+
+
+def upscale(img: IMG, scale: int) -> IMG:
+    """按整数倍数放大，使用最近邻插值保持像素风格"""
+    if scale == 1:
+        return img
+    return img.resize((img.width * scale, img.height * scale), Resampling.NEAREST)
+
+
+def warm_up(talents: Iterable[Talent], scale: float = 1):
+    """预先绘制所有标题和天赋卡片"""
+    for text in TITLES:
+        draw_title(text, scale)
+    for talent in talents:
+        draw_talent(talent, scale)
@@ -0,0 +1,153 @@
+"""图片编码：JPEG、WebP 和调色板 PNG，可以限制输出大小
+
+像素风格的图片颜色很少，量化为调色板 PNG 通常比 JPEG 小得多且没有压缩痕迹；
+量化在放大之前进行，最近邻放大不产生新颜色，结果与放大后再量化相同
+"""
+
+import time
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Literal, NamedTuple
+
+from PIL import Image
+from PIL.Image import Image as IMG
+
+from .drawer import upscale
+
+ImageFormat = Literal["jpeg", "webp", "png"]
+
+MIMETYPES = {"jpeg": "image/jpeg", "webp": "image/webp", "png": "image/png"}
+EXTENSIONS = {"jpeg": "jpg", "webp": "webp", "png": "png"}
+MIN_QUALITY = 10  # 按大小查找质量时的下限
+MIN_COLORS = 16  # 按大小查找调色板颜色数时的下限
+
+
+@dataclass(frozen=True)
+class EncoderOptions:
+    format: ImageFormat = "jpeg"
+    quality: int = 75  # JPEG 和 WebP 的质量，1-100
+    subsampling: Literal["4:4:4", "4:2:2", "4:2:0"] = "4:2:0"  # JPEG 色度抽样
+    progressive: bool = False  # 渐进式 JPEG，体积略小，编码较慢
+    webp_method: int = 4  # WebP 压缩方法，0-6，越大越慢、体积越小
+    colors: int = 256  # 调色板 PNG 的颜色数，2-256
+    max_bytes: int = 0  # 输出大小上限，为 0 时不限制
+
+
+class Encoded(NamedTuple):
+    data: bytes
+    format: ImageFormat
+    quality: int  # 实际使用的质量，PNG 为颜色数
+    attempts: int  # 编码次数，超出大小上限时会多次编码
+    seconds: float  # 编码耗时，包括放大和量化
+
+    @property
+    def size(self) -> int:
+        return len(self.data)
+
+    @property
+    def mimetype(self) -> str:
+        return MIMETYPES[self.format]
+
+    @property
+    def filename(self) -> str:
+        return f"remake.{EXTENSIONS[self.format]}"
+
+
+def save(img: IMG, format: ImageFormat, quality: int, options: EncoderOptions) -> bytes:
+    output = BytesIO()
+    if format == "jpeg":
+        img.save(
+            output,
+            format="JPEG",
+            quality=quality,
+            subsampling=options.subsampling,
+            progressive=options.progressive,
+        )
+    elif format == "webp":
+        img.save(output, format="WEBP", quality=quality, method=options.webp_method)
+    else:
+        img.save(output, format="PNG")
+    return output.getvalue()
+
+
+def quantize(img: IMG, colors: int) -> IMG:
+    """量化为调色板图片，不抖动，保持色块平整"""
+    return img.quantize(
+        colors, method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE
+    )
+
+
+def search_quality(
+    img: IMG, format: ImageFormat, options: EncoderOptions
+) -> tuple[bytes, int, int]:
+    """二分查找不超出大小上限的最高质量，返回数据、质量和编码次数
+
+    最低质量仍然超出时不再查找，返回最低质量的结果
+    """
+    data = save(img, format, options.quality, options)
+    if not options.max_bytes or len(data) <= options.max_bytes:
+        return data, options.quality, 1
+    if options.quality <= MIN_QUALITY:
+        return data, options.quality, 1
+
+    best = save(img, format, MIN_QUALITY, options), MIN_QUALITY
+    attempts = 2
+    if len(best[0]) > options.max_bytes:
+        return best[0], best[1], attempts
+
+    low, high = MIN_QUALITY + 1, options.quality - 1
+    while low <= high:
+        quality = (low + high) // 2
+        data = save(img, format, quality, options)
+        attempts += 1
+        if len(data) <= options.max_bytes:
+            best = data, quality
+            low = quality + 1
+        else:
+            high = quality - 1
+    return best[0], best[1], attempts
+
+
+def search_colors(
+    img: IMG, scale: int, options: EncoderOptions
+) -> tuple[bytes, int, int]:
+    """超出大小上限时每次将颜色数减为 1/4，直到不超出或达到下限
+
+    返回数据、颜色数和编码次数；已经是调色板图片时直接编码
+    """
+    if img.mode == "P":
+        return (
+            save(upscale(img, scale), "png", 0, options),
+            len(img.getcolors() or ()),
+            1,
+        )
+
+    colors = options.colors
+    attempts = 0
+    while True:
+        data = save(upscale(quantize(img, colors), scale), "png", 0, options)
+        attempts += 1
+        if (
+            not options.max_bytes
+            or len(data) <= options.max_bytes
+            or colors <= MIN_COLORS
+        ):
+            return data, colors, attempts
+        colors = max(colors // 4, MIN_COLORS)
+
+
+def encode(img: IMG, options: EncoderOptions, scale: int = 1) -> Encoded:
+    """放大 scale 倍后编码，有大小上限时超出上限的部分按质量或颜色数查找
+
+    找不到满足上限的参数时返回最小的结果，由调用者决定如何处理
+    """
+    begin = time.perf_counter()
+    if options.format == "png":
+        data, quality, attempts = search_colors(img, scale, options)
+    else:
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        data, quality, attempts = search_quality(
+            upscale(img, scale), options.format, options
+        )
+    return Encoded(data, options.format, quality, attempts, time.perf_counter() - begin)
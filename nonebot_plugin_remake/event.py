@@ -1,11 +1,11 @@
-import json
 import random
-from collections.abc import Iterator
-from pathlib import Path
-from typing import Union
+from collections.abc import Hashable, Iterator
+from typing import Optional, Union
 
-from .property import Property
-from .utils import parse_condition
+from .age import AgeEvents
+from .condition import ALWAYS, NEVER, parse_condition
+from .property import NO_EFFECT, Property, compile_effect
+from .sampler import choose, choose_masked
 
 
 class Branch:
@@ -16,76 +16,159 @@ class Branch:
 
 
 class WeightedEvent:
-    def __init__(self, s: Union[str, int]):
+    def __init__(self, event_id: int, weight: float = 1.0):
+        self.event_id = event_id
+        self.weight = weight
+
+    @classmethod
+    def parse(cls, s: Union[str, int]) -> "WeightedEvent":
         if not isinstance(s, str) or "*" not in s:
-            self.weight: float = 1.0
-            self.event_id: int = int(s)
-        else:
-            ss = s.split("*")
-            self.weight: float = float(ss[1])
-            self.event_id: int = int(ss[0])
+            return cls(int(s))
+        ss = s.split("*")
+        return cls(int(ss[0]), float(ss[1]))
 
 
 class Event:
     def __init__(self, data: dict):
         self.id: int = int(data["id"])
         self.name: str = data["event"]
-        self.include = (
-            parse_condition(data["include"]) if "include" in data else lambda _: True
-        )
-        self.exclude = (
-            parse_condition(data["exclude"]) if "exclude" in data else lambda _: False
-        )
-        self.effect: dict[str, int] = data["effect"] if "effect" in data else {}
+        self.include = parse_condition(data["include"]) if "include" in data else ALWAYS
+        self.exclude = parse_condition(data["exclude"]) if "exclude" in data else NEVER
+        self.effect = compile_effect(data["effect"]) if "effect" in data else NO_EFFECT
         self.branch: list[Branch] = (
             [Branch(x) for x in data["branch"]] if "branch" in data else []
         )
         self.no_random = "NoRandom" in data and data["NoRandom"]
         self.post_event = data["postEvent"] if "postEvent" in data else None
 
+    @property
+    def deps(self) -> frozenset[Hashable]:
+        return self.include.deps | self.exclude.deps
+
     def check_condition(self, prop: Property) -> bool:
-        return not self.no_random and self.include(prop) and not self.exclude(prop)
+        return (
+            not self.no_random
+            and self.include.check(prop)
+            and not self.exclude.check(prop)
+        )
+
+    def check_permanence(self, prop: Property) -> tuple[bool, bool]:
+        """返回条件是否满足，以及不满足时是否在这一生中再也不可能满足"""
+        if self.no_random:
+            return False, True
+        if self.exclude.check(prop):
+            return False, self.exclude.rising
+        if self.include.check(prop):
+            return True, False
+        return False, self.include.falling
 
     def run(self, prop: Property, runner) -> Iterator[str]:
         for b in self.branch:
-            if b.condition(prop):
+            if b.condition.check(prop):
                 prop.apply(self.effect)
                 yield self.name
                 yield from runner(b.event_id)
                 return
         prop.apply(self.effect)
-        prop.EVT.add(self.id)
+        prop.add("EVT", self.id)
         yield self.name
         if self.post_event:
             yield self.post_event
 
+    def run_step(self, prop: Property, log: list[str]) -> Optional[int]:
+        """执行事件并写入日志，返回需要继续执行的分支事件"""
+        for b in self.branch:
+            if b.condition.check(prop):
+                prop.apply(self.effect)
+                log.append(self.name)
+                return b.event_id
+        prop.apply(self.effect)
+        prop.add("EVT", self.id)
+        log.append(self.name)
+        if self.post_event:
+            log.append(self.post_event)
+        return None
+
+
+def load_events(data: dict[str, dict]) -> dict[int, Event]:
+    return {int(k): Event(v) for k, v in data.items()}
+
+
+def event_dependents(events: dict[int, Event]) -> dict[Hashable, tuple[int, ...]]:
+    """属性 -> 条件读取了该属性的事件"""
+    dependents: dict[Hashable, list[int]] = {}
+    for event in events.values():
+        if event.no_random:
+            continue
+        for dep in event.deps:
+            dependents.setdefault(dep, []).append(event.id)
+    return {k: tuple(v) for k, v in dependents.items()}
+
 
 class EventManager:
-    def __init__(self, prop: Property):
+    def __init__(
+        self,
+        prop: Property,
+        events: dict[int, Event],
+        dependents: dict[Hashable, tuple[int, ...]],
+        rng: random.Random,
+    ):
         self.prop = prop
-        self.events: dict[int, Event] = {}
-
-    def load(self, path: Path):
-        data: dict[str, dict] = json.load(path.open("r", encoding="utf8"))
-        self.events = {int(k): Event(v) for k, v in data.items()}
-
-    def rand_event(self, weighted_events: list[WeightedEvent]) -> int:
-        events_checked = [
-            e
-            for e in weighted_events
-            if self.events[e.event_id].check_condition(self.prop)
-        ]
-        total = sum(e.weight for e in events_checked)
-        rnd = random.random() * total
-        for e in events_checked:
-            rnd -= e.weight
-            if rnd <= 0:
-                return e.event_id
-        return weighted_events[0].event_id
+        self.rng = rng
+        self.events = events
+        self.dependents = dependents
+        # 事件条件的缓存结果，依赖的属性变化后失效
+        self.checked: dict[int, bool] = {}
+        self.checked_version = 0
+        # 这一生中再也不可能发生的事件，不再重新检查条件
+        self.impossible: set[int] = set()
+
+    def invalidate_checked(self):
+        changes = self.prop.changes
+        for key in changes[self.checked_version :]:
+            for event_id in self.dependents.get(key, ()):
+                self.checked.pop(event_id, None)
+        self.checked_version = len(changes)
+
+    def check_event(self, event_id: int) -> bool:
+        if event_id in self.impossible:
+            checked = False
+        else:
+            checked, impossible = self.events[event_id].check_permanence(self.prop)
+            if impossible:
+                self.impossible.add(event_id)
+        self.checked[event_id] = checked
+        return checked
+
+    def rand_event(self, age_events: AgeEvents) -> int:
+        event_ids, weights, cum_weights = age_events
+        self.invalidate_checked()
+        checked = self.checked
+        events_checked: list[int] = []
+        for i, event_id in enumerate(event_ids):
+            result = checked.get(event_id)
+            if result is None:
+                result = self.check_event(event_id)
+            if result:
+                events_checked.append(i)
+        rnd = self.rng.random()
+        if not events_checked:
+            return event_ids[0]
+        if len(events_checked) == len(event_ids):
+            # 所有事件都满足条件时直接使用预先计算的前缀和
+            return event_ids[choose(cum_weights, rnd)]
+        return event_ids[choose_masked(weights, events_checked, rnd)]
 
     def run_event(self, event_id: int) -> Iterator[str]:
         return self.events[event_id].run(self.prop, self.run_event)
 
-    def run_events(self, weighted_events: list[WeightedEvent]) -> Iterator[str]:
-        event_id = self.rand_event(weighted_events)
+    def run_events(self, age_events: AgeEvents) -> Iterator[str]:
+        event_id = self.rand_event(age_events)
         return self.run_event(event_id)
+
+    def run_event_into(self, event_id: int, log: list[str]):
+        stack = [event_id]
+        while stack:
+            branch_id = self.events[stack.pop()].run_step(self.prop, log)
+            if branch_id is not None:
+                stack.append(branch_id)
@@ -1,13 +1,14 @@
+import random
+import struct
 from collections.abc import Iterator
 from dataclasses import dataclass
-from pathlib import Path
+from typing import Literal, Optional
 
 from .age import AgeManager
+from .data import GameData, get_game_data
 from .event import EventManager
-from .property import Property, Summary
-from .talent import Talent, TalentManager
-
-data_path = Path(__file__).parent / "resources" / "data"
+from .property import Property, Summary, compile_effect
+from .talent import Talent, TalentManager, conflict_talents
 
 
 @dataclass
@@ -40,17 +41,72 @@ class PerAgeResult:
         )
 
 
-class Life:
-    def __init__(self):
-        self.property = Property()
-        self.age = AgeManager(self.property)
-        self.event = EventManager(self.property)
-        self.talent = TalentManager(self.property)
+@dataclass(frozen=True)
+class LifeRecord:
+    """重现一次人生所需的全部信息"""
+
+    seed: int
+    talents: tuple[int, ...]  # 天赋 id
+    property: tuple[int, int, int, int]  # 颜值、智力、体质、家境
+
+    def to_bytes(self) -> bytes:
+        return struct.pack(
+            f"<QB{len(self.talents)}H4h",
+            self.seed,
+            len(self.talents),
+            *self.talents,
+            *self.property,
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "LifeRecord":
+        seed, count = struct.unpack_from("<QB", data)
+        *talents, chr_, int_, str_, mny = struct.unpack_from(f"<{count}H4h", data, 9)
+        return cls(seed, tuple(talents), (chr_, int_, str_, mny))
+
+
+Engine = Literal["generator", "iterative"]
+
 
-    def load(self):
-        self.age.load(data_path / "age.json")
-        self.event.load(data_path / "events.json")
-        self.talent.load(data_path / "talents.json")
+class Life:
+    def __init__(
+        self,
+        data: Optional[GameData] = None,
+        engine: Engine = "iterative",
+        seed: Optional[int] = None,
+    ):
+        data = data or get_game_data()
+        self.data = data
+        self.engine = engine
+        self.seed = random.getrandbits(64) if seed is None else seed
+        self.rng = random.Random(self.seed)
+        # 选择天赋、分配属性使用单独的随机数，人生只由种子、天赋和属性决定
+        self.setup_rng = random.Random(self.rng.getrandbits(64))
+        self.allocation = (0, 0, 0, 0)
+        self.property = Property(self.rng)
+        self.age = AgeManager(self.property, data.ages)
+        self.event = EventManager(
+            self.property, data.events, data.event_dependents, self.rng
+        )
+        self.talent = TalentManager(self.property, data.talents, self.setup_rng)
+
+    @classmethod
+    def from_record(
+        cls,
+        record: LifeRecord,
+        data: Optional[GameData] = None,
+        engine: Engine = "iterative",
+    ) -> "Life":
+        life = cls(data, engine, record.seed)
+        life.set_talents([life.data.talents_by_id[i] for i in record.talents])
+        chr_, int_, str_, mny = record.property
+        life.apply_property({"CHR": chr_, "INT": int_, "STR": str_, "MNY": mny})
+        return life
+
+    def record(self) -> LifeRecord:
+        return LifeRecord(
+            self.seed, tuple(t.id for t in self.talent.talents), self.allocation
+        )
 
     def alive(self) -> bool:
         return self.property.LIF > 0
@@ -66,6 +122,11 @@ class Life:
         )
 
     def run(self) -> Iterator[PerAgeResult]:
+        if self.engine == "generator":
+            return self.run_generator()
+        return self.run_iterative()
+
+    def run_generator(self) -> Iterator[PerAgeResult]:
         while self.alive():
             self.age.grow()
             talent_log = self.talent.update_talent()
@@ -76,19 +137,59 @@ class Life:
                 list(talent_log),
             )
 
+    def run_iterative(self) -> Iterator[PerAgeResult]:
+        prop = self.property
+        talents = self.talent.talents
+        while prop.LIF > 0:
+            self.age.grow()
+            event_id = self.event.rand_event(self.age.get_events())
+            # 与 run_generator 一致：记录本年事件发生前的属性，天赋在事件之后发动
+            result = PerAgeResult(self.get_property(), [], [])
+            self.event.run_event_into(event_id, result.event_log)
+            for t in talents:
+                if t.id not in prop.TLT:
+                    result.talent_log.extend(t.run(prop))
+            yield result
+
     def rand_talents(self, num: int) -> list[Talent]:
         return list(self.talent.rand_talents(num))
 
+    def random_talents(self, talents: list[Talent], num: int = 3) -> list[Talent]:
+        """从给出的天赋中随机选择互不冲突的 num 个"""
+        while True:
+            nums = self.setup_rng.sample(range(len(talents)), num)
+            nums.sort()
+            talents_selected = [talents[n] for n in nums]
+            if not conflict_talents(talents_selected):
+                return talents_selected
+
     def set_talents(self, talents: list[Talent]):
         for t in talents:
             self.talent.add_talent(t)
         self.talent.update_talent_prop()
 
     def apply_property(self, effect: dict[str, int]):
-        self.property.apply(effect)
+        self.property.apply(compile_effect(effect))
+        self.allocation = (
+            effect.get("CHR", 0),
+            effect.get("INT", 0),
+            effect.get("STR", 0),
+            effect.get("MNY", 0),
+        )
 
     def total_property(self) -> int:
         return self.property.total
 
+    def random_property(self) -> list[int]:
+        """随机分配颜值、智力、体质、家境"""
+        total_prop = self.total_property()
+        half_prop1 = int(total_prop / 2)
+        half_prop2 = total_prop - half_prop1
+        num1 = self.setup_rng.randint(0, half_prop1)
+        num2 = self.setup_rng.randint(0, half_prop2)
+        nums = [num1, num2, half_prop1 - num1, half_prop2 - num2]
+        self.setup_rng.shuffle(nums)
+        return nums
+
     def gen_summary(self) -> Summary:
         return self.property.gen_summary()
@@ -0,0 +1,305 @@
+import re
+import struct
+import time
+import traceback
+from itertools import count
+
+from nonebot import get_driver, get_plugin_config, require
+from nonebot.adapters import Event
+from nonebot.exception import AdapterException
+from nonebot.log import logger
+from nonebot.matcher import Matcher
+from nonebot.plugin import PluginMetadata, inherit_supported_adapters
+from nonebot.rule import to_me
+from nonebot.utils import run_sync
+
+require("nonebot_plugin_alconna")
+require("nonebot_plugin_waiter")
+require("nonebot_plugin_localstore")
+
+from nonebot_plugin_alconna import (
+    Alconna,
+    AlconnaQuery,
+    Option,
+    Query,
+    UniMessage,
+    on_alconna,
+    store_true,
+)
+from nonebot_plugin_localstore import get_plugin_data_file
+from nonebot_plugin_waiter import waiter
+
+from .config import Config
+from .data import get_game_data
+from .drawer import warm_up
+from .encoder import EncoderOptions
+from .life import Life, LifeRecord
+from .render import RenderBusy, RenderExecutor, RenderOptions, cache_stats
+from .replay import ReplayStore
+from .talent import conflict_talents
+
+__plugin_meta__ = PluginMetadata(
+    name="人生重开",
+    description="人生重开模拟器",
+    usage="@我 remake/liferestart/人生重开",
+    type="application",
+    homepage="https://github.com/noneplugin/nonebot-plugin-remake",
+    config=Config,
+    supported_adapters=inherit_supported_adapters("nonebot_plugin_alconna"),
+)
+
+
+plugin_config = get_plugin_config(Config)
+driver = get_driver()
+render_executor = RenderExecutor(
+    plugin_config.remake_render_executor,
+    plugin_config.remake_render_workers,
+    plugin_config.remake_render_queue,
+    RenderOptions(
+        plugin_config.remake_render_scale,
+        plugin_config.remake_upscale,
+        plugin_config.remake_memory_budget,
+        plugin_config.remake_progressive,
+        EncoderOptions(
+            plugin_config.remake_image_format,
+            plugin_config.remake_image_quality,
+            plugin_config.remake_jpeg_subsampling,
+            plugin_config.remake_jpeg_progressive,
+            plugin_config.remake_webp_method,
+            plugin_config.remake_png_colors,
+            plugin_config.remake_image_max_size * 1024,
+        ),
+    ),
+    plugin_config.remake_warm_up,
+)
+BUSY_MESSAGE = "当前重开人生的人太多了，请稍后再试"
+STATS_INTERVAL = 100  # 每发送多少个人生记录一次天赋卡片缓存的统计
+lives_sent = count(1)
+
+
+async def log_cache_stats():
+    stats = await render_executor.run(cache_stats)
+    worker = "one render worker" if render_executor.mode == "process" else "renderer"
+    logger.debug(
+        f"Talent card cache of {worker}: {stats.entries} entries, "
+        f"{stats.nbytes / 1024 / 1024:.1f} MB, hit rate {stats.hit_rate:.1%}, "
+        f"{stats.evictions} evictions"
+    )
+
+
+@driver.on_startup
+async def _():
+    data = await run_sync(get_game_data)()
+    logger.debug(f"Loaded remake data, age table uses {data.ages.nbytes} bytes")
+    # 进程模式下由各个工作进程自己预先绘制
+    if plugin_config.remake_warm_up and render_executor.mode == "thread":
+        await run_sync(warm_up)(
+            data.talents_by_id.values(), plugin_config.remake_render_scale
+        )
+        logger.debug("Pre-rendered remake talent cards")
+    await render_executor.start()
+    if plugin_config.remake_warm_up:
+        await log_cache_stats()
+
+
+@driver.on_shutdown
+async def _():
+    render_executor.shutdown()
+    last_lives.close()
+
+
+matcher_remake = on_alconna(
+    Alconna(
+        "remake",
+        Option(
+            "--random|随机",
+            default=False,
+            action=store_true,
+            help_text="随机选择天赋和属性",
+        ),
+        Option(
+            "--replay|重放",
+            default=False,
+            action=store_true,
+            help_text="重放上一次的人生",
+        ),
+    ),
+    aliases={"liferestart", "人生重开", "人生重来"},
+    block=True,
+    rule=to_me(),
+    use_cmd_start=True,
+    priority=12,
+)
+matcher_remake.shortcut("随机人生", arguments=["--random"], prefix=True)
+matcher_remake.shortcut("重放人生", arguments=["--replay"], prefix=True)
+
+# 用户 id -> 上一次人生的记录（LifeRecord.to_bytes）
+last_lives = ReplayStore(
+    get_plugin_data_file("replay.db"), plugin_config.remake_replay_max_users
+)
+
+
+@matcher_remake.handle()
+async def _(
+    matcher: Matcher,
+    event: Event,
+    random_life: Query[bool] = AlconnaQuery("random.value", False),
+    replay: Query[bool] = AlconnaQuery("replay.value", False),
+):
+    if render_executor.busy:
+        await matcher.finish(BUSY_MESSAGE)
+
+    user_id = event.get_user_id()
+    if replay.result:
+        if not (record := await run_sync(last_lives.get)(user_id)):
+            await matcher.finish("你还没有重开过人生")
+        try:
+            life = Life.from_record(LifeRecord.from_bytes(record))
+        except (KeyError, struct.error):
+            # 数据更新后记录中的天赋可能已经不存在
+            await run_sync(last_lives.delete)(user_id)
+            logger.debug(f"Deleted stale replay record of user {user_id}")
+            await matcher.finish("你上一次的人生已经无法重放了")
+        await matcher.send("你的人生正在重放...")
+        await send_life(matcher, life)
+        return
+
+    life = Life()
+    talents = life.rand_talents(10)
+
+    @waiter(waits=["message"], keep_session=True)
+    async def get_response(event: Event):
+        logger.debug(event.get_message())
+        return event.get_plaintext()
+
+    async def select_talents():
+        for _ in range(3):
+            resp = await get_response.wait(timeout=30)
+            if resp is None:
+                await matcher.finish("人生重开已取消")
+
+            elif matched := re.fullmatch(r"\s*(\d)\s*(\d)\s*(\d)\s*", resp):
+                nums = list(matched.groups())
+                nums = [int(n) for n in nums]
+                nums.sort()
+                if nums[-1] >= 10:
+                    await matcher.send("请发送正确的编号")
+                talents_selected = [talents[n] for n in nums]
+                if conflict := conflict_talents(talents_selected):
+                    await matcher.send(
+                        f"你选择的天赋“{conflict[0].name}”和“{conflict[1].name}”不能同时拥有，请重新选择"
+                    )
+                return talents_selected
+
+            elif re.fullmatch(r"[\d\s]+", resp):
+                await matcher.send("请发送正确的编号，如“0 1 2”")
+                continue
+
+            elif resp == "随机":
+                return life.random_talents(talents)
+
+            else:
+                await matcher.finish("人生重开已取消")
+
+    if random_life.result:
+        talents_selected = life.random_talents(talents)
+    else:
+        msg = "请发送编号选择3个天赋，如“0 1 2”，或发送“随机”随机选择"
+        des = "\n".join([f"{i}.{t}" for i, t in enumerate(talents)])
+        await matcher.send(f"{msg}\n\n{des}")
+        talents_selected = await select_talents()
+
+        if talents_selected is None:
+            await matcher.finish("人生重开已取消")
+
+    life.set_talents(talents_selected)
+    total_prop = life.total_property()
+
+    async def select_nums():
+        for _ in range(3):
+            resp = await get_response.wait(timeout=30)
+            if resp is None:
+                await matcher.finish()
+
+            elif matched := re.fullmatch(
+                r"\s*(\d{1,2})\s+(\d{1,2})\s+(\d{1,2})\s+(\d{1,2})\s*", resp
+            ):
+                nums = list(matched.groups())
+                nums = [int(n) for n in nums]
+                if sum(nums) != total_prop:
+                    await matcher.send(f"属性之和需为{total_prop}，请重新发送")
+                    continue
+                elif max(nums) > 10:
+                    await matcher.send("每个属性不能超过10，请重新发送")
+                    continue
+                return nums
+
+            elif resp == "随机":
+                return life.random_property()
+
+            elif re.fullmatch(r"[\d\s]+", resp):
+                await matcher.send("请发送正确的数字，如“5 5 5 5”")
+                continue
+
+            else:
+                await matcher.finish("人生重开已取消")
+
+    if random_life.result:
+        nums = life.random_property()
+    else:
+        msg = (
+            "请发送4个数字分配“颜值、智力、体质、家境”4个属性，"
+            "如“5 5 5 5”，或发送“随机”随机选择；"
+            f"可用属性点为{total_prop}，每个属性不能超过10"
+        )
+        await matcher.send(msg)
+        nums = await select_nums()
+
+        if nums is None:
+            await matcher.finish("人生重开已取消")
+
+    prop = {"CHR": nums[0], "INT": nums[1], "STR": nums[2], "MNY": nums[3]}
+    life.apply_property(prop)
+
+    await matcher.send("你的人生正在重开...")
+    await run_sync(last_lives.put)(user_id, life.record().to_bytes())
+    await send_life(matcher, life)
+
+
+async def send_life(matcher: Matcher, life: Life):
+    max_size = plugin_config.remake_image_max_size * 1024
+    # 绘图名额在最后一张图片编码完成后就释放，发送图片时不占用
+    images = render_executor.render(life)
+    try:
+        async for img in images:
+            param = "colors" if img.format == "png" else "quality"
+            logger.debug(
+                f"Encoded {img.format} image of {img.size} bytes "
+                f"({param} {img.quality}, {img.attempts} attempts) "
+                f"in {img.seconds * 1000:.0f} ms"
+            )
+            if max_size and img.size > max_size:
+                logger.warning(
+                    f"Image of {img.size} bytes exceeds "
+                    f"remake_image_max_size even at the lowest {param}"
+                )
+            begin = time.perf_counter()
+            try:
+                await UniMessage.image(
+                    raw=img.data, mimetype=img.mimetype, name=img.filename
+                ).send()
+            except AdapterException:
+                logger.warning("发送图片失败，尝试发送文件")
+                await UniMessage.file(
+                    raw=img.data, mimetype=img.mimetype, name=img.filename
+                ).send()
+            logger.debug(f"Sent image in {(time.perf_counter() - begin) * 1000:.0f} ms")
+        if next(lives_sent) % STATS_INTERVAL == 0:
+            await log_cache_stats()
+    except RenderBusy:
+        await matcher.finish(BUSY_MESSAGE)
+    except Exception:
+        logger.warning(traceback.format_exc())
+        await matcher.finish("你的人生重开失败（")
+    finally:
+        await images.aclose()
@@ -1,5 +1,10 @@
+import random
+from collections.abc import Hashable
 from dataclasses import dataclass
-from typing import NamedTuple
+from functools import lru_cache
+from typing import Callable, NamedTuple, Optional
+
+from .codegen import compile_function
 
 
 class PropGrade(NamedTuple):
@@ -195,8 +200,76 @@ class Summary:
         )
 
 
+SCALAR_ATTRS = ("AGE", "CHR", "INT", "STR", "MNY", "SPR", "LIF", "TMS")
+RDM_ATTRS = ("CHR", "INT", "STR", "MNY", "SPR")  # RDM 随机作用于其中一个属性
+
+
+class Effect(NamedTuple):
+    """编译后的效果"""
+
+    # (属性名, 变化量) 序列，属性名为 "RDM" 时在应用时随机选择，批量模拟按此应用
+    items: tuple[tuple[str, int], ...]
+    # 直接读写各个属性并记录修改的函数，由 Property.apply 调用
+    apply: Callable[["Property"], None]
+
+
+@lru_cache(maxsize=1024)
+def compile_items(items: tuple[tuple[str, int], ...]) -> Callable[["Property"], None]:
+    lines = []
+    keys = []
+    names = ["x"]
+    for i, (key, value) in enumerate(items):
+        if key == "RDM":
+            # 与逐个应用相同，每个 RDM 依次消耗一个随机数
+            lines.append(f"    k{i} = x.rng.choice(RDM_ATTRS)")
+            lines.append(f"    setattr(x, k{i}, getattr(x, k{i}) + {value})")
+            keys.append(f"k{i}")
+            names.append(f"k{i}")
+        else:
+            lines.append(f"    x.{key} += {value}")
+            keys.append(repr(key))
+    if keys:
+        lines.append(f"    x.changes.extend(({', '.join(keys)},))")
+    return compile_function(
+        "def f(x):\n" + ("\n".join(lines) or "    pass") + "\n",
+        "<effect>",
+        {"getattr": getattr, "setattr": setattr, "RDM_ATTRS": RDM_ATTRS},
+        names=names,
+        attrs=(*SCALAR_ATTRS, "rng", "choice", "changes", "extend"),
+    )
+
+
+def compile_effect(effect: dict[str, int]) -> Effect:
+    for key in effect:
+        if key != "RDM" and key not in SCALAR_ATTRS:
+            raise ValueError(f"unknown effect attribute {key!r}")
+    items = tuple((key, int(value)) for key, value in effect.items())
+    return Effect(items, compile_items(items))
+
+
+NO_EFFECT = compile_effect({})
+
+
 class Property:
-    def __init__(self):
+    __slots__ = (
+        "AGE",
+        "CHR",
+        "INT",
+        "STR",
+        "MNY",
+        "SPR",
+        "LIF",
+        "TMS",
+        "TLT",
+        "EVT",
+        "AVT",
+        "SUM",
+        "total",
+        "changes",
+        "rng",
+    )
+
+    def __init__(self, rng: Optional[random.Random] = None):
         self.AGE: int = -1  # 年龄 age AGE
         self.CHR: int = 0  # 颜值 charm CHR
         self.INT: int = 0  # 智力 intelligence INT
@@ -208,15 +281,25 @@ class Property:
         self.TLT: set[int] = set()  # 天赋 talent TLT
         self.EVT: set[int] = set()  # 事件 event EVT
         self.AVT: set[int] = set()  # 触发过的事件 Achieve Event
+        self.SUM: int = 0  # 总评 summary SUM
         self.total: int = 20
+        # 修改记录，每次修改的下标即为其版本号
+        # 数值属性记为属性名，集合属性记为 (属性名, 新增元素)
+        self.changes: list[Hashable] = []
+        self.rng = rng or random.Random()
+
+    @property
+    def version(self) -> int:
+        return len(self.changes)
+
+    def apply(self, effect: Effect):
+        effect.apply(self)
 
-    def apply(self, effect: dict[str, int]):
-        for key in effect:
-            if key == "RDM":
-                k = ["CHR", "INT", "STR", "MNY", "SPR"][id(key) % 5]
-                setattr(self, k, getattr(self, k) + effect[key])
-                continue
-            setattr(self, key, getattr(self, key) + effect[key])
+    def add(self, key: str, item: int):
+        items: set[int] = getattr(self, key)
+        if item not in items:
+            items.add(item)
+            self.changes.append((key, item))
 
     def gen_summary(self) -> Summary:
         self.SUM = (
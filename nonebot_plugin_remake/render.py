@@ -0,0 +1,221 @@
+"""绘图执行器：在专用的线程池或进程池中绘制人生，限制同时绘制和排队的数量"""
+
+import asyncio
+import multiprocessing
+import sys
+from collections.abc import AsyncGenerator, AsyncIterator, Iterator
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Literal, Optional, Union
+
+from .cache import CacheStats
+from .data import get_game_data
+from .drawer import draw_life_pages, stream_life_pages, talent_cache, warm_up
+from .encoder import Encoded, EncoderOptions, encode
+from .life import Life, LifeRecord
+
+
+@dataclass(frozen=True)
+class RenderOptions:
+    scale: int = 1  # 按 1/scale 的尺寸绘制
+    upscale: bool = True  # 缩小绘制后用最近邻插值放大回原尺寸
+    memory_budget: int = 0  # 单张图片的内存上限，MB，为 0 时不限制
+    progressive: bool = False  # 边模拟边绘制，每页一列
+    encoder: EncoderOptions = field(default_factory=EncoderOptions)
+
+
+def life_images(life: Life, options: RenderOptions) -> Iterator[Encoded]:
+    """模拟人生并逐页绘制、编码，每次取出时才绘制下一页"""
+    scale = options.scale
+    factor = scale if options.upscale else 1
+    # 内存上限针对放大后的图片
+    max_bytes = options.memory_budget * 1024 * 1024 // factor**2
+    talents = life.talent.talents
+    init_prop = life.get_property()
+    if options.progressive:
+        pages = stream_life_pages(
+            talents, init_prop, life.run(), life.gen_summary, scale, max_bytes
+        )
+    else:
+        results = list(life.run())
+        summary = life.gen_summary()
+        pages = draw_life_pages(talents, init_prop, results, summary, scale, max_bytes)
+    for page in pages:
+        img = encode(page, options.encoder, factor)
+        del page  # 发送这一页时不再持有图像
+        yield img
+
+
+def render_record(record: LifeRecord, options: RenderOptions) -> list[Encoded]:
+    """在工作进程中重现并绘制人生，参数和返回值都很小，不传递 Pillow 对象"""
+    life = Life.from_record(record)
+    return list(life_images(life, options))
+
+
+def init_worker(warm: bool, scale: int):
+    """工作进程的初始化：加载数据，按配置预先绘制天赋卡片"""
+    data = get_game_data()
+    if warm:
+        warm_up(data.talents_by_id.values(), scale)
+
+
+def ping():
+    """确认工作进程已经启动并完成初始化"""
+
+
+def cache_stats() -> CacheStats:
+    """天赋卡片缓存的统计，进程模式下是执行这个函数的工作进程的统计"""
+    return talent_cache.stats()
+
+
+@contextmanager
+def main_hidden() -> Iterator[None]:
+    """创建工作进程期间隐藏主模块的路径和名称
+
+    forkserver 和 spawn 创建的进程默认以 __mp_main__ 重新导入主模块，即机器人
+    的入口脚本，会再次初始化 NoneBot、加载所有插件；隐藏后工作进程只导入本模块。
+    进程在提交第一个任务时同步创建，隐藏只持续这一段时间
+    """
+    main = sys.modules["__main__"]
+    saved = {
+        name: main.__dict__[name]
+        for name in ("__file__", "__spec__")
+        if name in main.__dict__
+    }
+    main.__dict__.pop("__file__", None)
+    main.__spec__ = None
+    try:
+        yield
+    finally:
+        main.__dict__.update(saved)
+
+
+class RenderBusy(Exception):
+    """正在绘制和排队的人生都已达到上限"""
+
+
+class RenderExecutor:
+    """绘图专用的执行器，不占用 run_sync 使用的默认线程池
+
+    最多同时绘制 workers 个人生，最多 max_queue 个人生排队，超出时拒绝；
+    名额只在绘制和编码时占用，发送图片时不占用
+    """
+
+    def __init__(
+        self,
+        mode: Literal["thread", "process"],
+        workers: int,
+        max_queue: int,
+        options: RenderOptions,
+        warm: bool = False,
+    ):
+        self.mode = mode
+        self.workers = workers
+        self.max_queue = max_queue
+        self.options = options
+        self.warm = warm  # 进程模式下在每个工作进程中预先绘制
+        self.pool: Optional[Executor] = None
+        self.semaphore: Optional[asyncio.Semaphore] = None
+        self.running = 0
+        self.waiting = 0
+
+    async def start(self):
+        """在事件循环中调用；进程模式下预先创建并初始化工作进程
+
+        此时 NoneBot 已经启动了其他线程，不使用 fork 创建进程
+        """
+        self.semaphore = asyncio.Semaphore(self.workers)
+        if self.mode == "thread":
+            self.pool = ThreadPoolExecutor(
+                self.workers, thread_name_prefix="remake_render"
+            )
+            return
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("forkserver")
+            # 在 forkserver 中预先导入本模块，而不是默认的 __main__
+            context.set_forkserver_preload([__name__])
+        else:
+            context = multiprocessing.get_context("spawn")
+        pool = ProcessPoolExecutor(
+            self.workers,
+            mp_context=context,
+            initializer=init_worker,
+            initargs=(self.warm, self.options.scale),
+        )
+        with main_hidden():
+            pings = [
+                asyncio.wrap_future(pool.submit(ping)) for _ in range(self.workers)
+            ]
+        self.pool = pool
+        await asyncio.gather(*pings)
+
+    def shutdown(self):
+        if self.pool:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+
+    @property
+    def busy(self) -> bool:
+        return self.running >= self.workers and self.waiting >= self.max_queue
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        assert self.pool, "render executor is not started"
+        return await asyncio.get_running_loop().run_in_executor(self.pool, func, *args)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """占用一个绘图名额，排队的人生达到上限时抛出 RenderBusy"""
+        assert self.semaphore, "render executor is not started"
+        if self.busy:
+            raise RenderBusy
+        self.waiting += 1
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        try:
+            yield
+        finally:
+            self.running -= 1
+            self.semaphore.release()
+
+    async def render(self, life: Life) -> AsyncGenerator[Encoded, None]:
+        """逐张返回图片，名额和排队都已满时抛出 RenderBusy
+
+        在后台任务中占用名额绘制，编码好的图片放入队列，最后一张编码完成后
+        立即释放名额，发送图片不占用名额。线程模式下编码好一张就可以取出；
+        进程模式下在工作进程中按人生记录重现并绘制，所有图片一起返回
+        """
+        queue: asyncio.Queue[Union[Encoded, Exception, None]] = asyncio.Queue()
+        stopped = asyncio.Event()
+
+        async def produce():
+            try:
+                async with self.slot():
+                    if self.mode == "process":
+                        record = life.record()
+                        for img in await self.run(render_record, record, self.options):
+                            queue.put_nowait(img)
+                        return
+                    images = life_images(life, self.options)
+                    while not stopped.is_set():
+                        if (img := await self.run(next, images, None)) is None:
+                            break
+                        queue.put_nowait(img)
+            except Exception as e:
+                queue.put_nowait(e)
+            finally:
+                queue.put_nowait(None)
+
+        task = asyncio.create_task(produce())
+        try:
+            while (item := await queue.get()) is not None:
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            # 提前结束时不再绘制下一页，等待正在绘制的一页，避免超出同时绘制的数量
+            stopped.set()
+            await task
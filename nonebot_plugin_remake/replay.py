@@ -0,0 +1,62 @@
+"""保存每个用户上一次人生的记录，用于重放
+
+记录只有 LifeRecord.to_bytes 的二十几个字节，存放在 sqlite 中，重启后仍然可以
+重放；按最后一次重开的先后只保留最近的 max_users 个用户
+"""
+
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Optional
+
+
+class ReplayStore:
+    """线程安全，每次写入立即提交"""
+
+    def __init__(self, file: Path, max_users: int):
+        self.max_users = max_users
+        self.lock = threading.Lock()
+        file.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(file, check_same_thread=False)
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS lives ("
+                "user_id TEXT PRIMARY KEY, record BLOB NOT NULL, "
+                "updated INTEGER NOT NULL)"
+            )
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS lives_updated ON lives (updated)"
+            )
+
+    def get(self, user_id: str) -> Optional[bytes]:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT record FROM lives WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, user_id: str, record: bytes):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO lives VALUES (?, ?, "
+                "(SELECT COALESCE(MAX(updated), 0) + 1 FROM lives))",
+                (user_id, record),
+            )
+            # 超出上限时删除最早重开的用户
+            self.conn.execute(
+                "DELETE FROM lives WHERE updated <= ("
+                "SELECT updated FROM lives ORDER BY updated DESC LIMIT 1 OFFSET ?)",
+                (self.max_users,),
+            )
+
+    def delete(self, user_id: str):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM lives WHERE user_id = ?", (user_id,))
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM lives").fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
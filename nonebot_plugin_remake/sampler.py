@@ -0,0 +1,22 @@
+from array import array
+from bisect import bisect_left
+from collections.abc import Iterable, Sequence
+from itertools import accumulate
+
+
+def prefix_sums(weights: Iterable[float]) -> array:
+    return array("d", accumulate(weights))
+
+
+def choose(cum_weights: Sequence[float], rnd: float) -> int:
+    """按累积权重选取下标，rnd 为 [0, 1) 内的随机数
+
+    与逐个减去权重直到不大于 0 的做法选取结果相同
+    """
+    return bisect_left(cum_weights, rnd * cum_weights[-1])
+
+
+def choose_masked(weights: Sequence[float], indices: Sequence[int], rnd: float) -> int:
+    """只在 indices 对应的权重中选取，返回原始下标"""
+    cum_weights = list(accumulate(map(weights.__getitem__, indices)))
+    return indices[choose(cum_weights, rnd)]
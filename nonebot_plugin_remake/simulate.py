@@ -0,0 +1,220 @@
+"""多进程批量模拟人生，统计评级分布和天赋发动率
+
+python -m nonebot_plugin_remake.simulate -n 100000 -j 4
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import Counter
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Optional
+
+from .data import get_game_data
+from .life import Life
+from .property import AGESummary, SUMSummary
+
+
+@dataclass
+class SimulateOptions:
+    talents: Optional[tuple[int, ...]] = None  # 不指定时与随机人生相同，十选三
+    props: Optional[tuple[int, int, int, int]] = None  # 不指定时随机分配
+    seed: int = 0  # 第 i 个人生的种子为 seed + i
+
+
+@dataclass
+class ChunkStats:
+    """一批人生的统计结果，可以合并"""
+
+    lives: int = 0
+    years: int = 0
+    age_sum: int = 0
+    sum_sum: int = 0
+    age_judges: Counter = field(default_factory=Counter)  # 享年评价 -> 人生数
+    sum_judges: Counter = field(default_factory=Counter)  # 总评评价 -> 人生数
+    talent_lives: Counter = field(default_factory=Counter)  # 天赋 id -> 拥有的人生数
+    talent_hits: Counter = field(default_factory=Counter)  # 天赋 id -> 发动的人生数
+    seconds: float = 0  # 工作进程耗费的时间
+
+    def merge(self, other: "ChunkStats"):
+        self.lives += other.lives
+        self.years += other.years
+        self.age_sum += other.age_sum
+        self.sum_sum += other.sum_sum
+        self.age_judges.update(other.age_judges)
+        self.sum_judges.update(other.sum_judges)
+        self.talent_lives.update(other.talent_lives)
+        self.talent_hits.update(other.talent_hits)
+        self.seconds += other.seconds
+
+
+def run_chunk(start: int, count: int, options: SimulateOptions) -> ChunkStats:
+    data = get_game_data()
+    stats = ChunkStats()
+    begin = time.perf_counter()
+    for seed in range(options.seed + start, options.seed + start + count):
+        life = Life(data, seed=seed)
+        if options.talents is None:
+            talents = life.random_talents(life.rand_talents(10))
+        else:
+            talents = [data.talents_by_id[i] for i in options.talents]
+        life.set_talents(talents)
+        nums = life.random_property() if options.props is None else options.props
+        life.apply_property(
+            {"CHR": nums[0], "INT": nums[1], "STR": nums[2], "MNY": nums[3]}
+        )
+        for _ in life.run():
+            stats.years += 1
+        summary = life.gen_summary()
+
+        stats.lives += 1
+        stats.age_sum += summary.AGE.value
+        stats.sum_sum += summary.SUM.value
+        stats.age_judges[summary.AGE.judge] += 1
+        stats.sum_judges[summary.SUM.judge] += 1
+        for t in life.talent.talents:
+            stats.talent_lives[t.id] += 1
+            if t.id in life.property.TLT:
+                stats.talent_hits[t.id] += 1
+    stats.seconds = time.perf_counter() - begin
+    return stats
+
+
+def simulate(
+    lives: int,
+    options: SimulateOptions,
+    workers: Optional[int] = None,
+    chunk_size: int = 500,
+    progress: bool = False,
+) -> tuple[ChunkStats, float]:
+    """模拟 lives 个人生，返回统计结果和总耗时
+
+    结果只由人生数量和选项决定，与进程数、分批方式无关
+    """
+    # 先在主进程中加载数据，fork 出的工作进程直接共享；
+    # 不支持 fork 的平台上，工作进程从快照加载
+    get_game_data()
+    context = (
+        multiprocessing.get_context("fork")
+        if "fork" in multiprocessing.get_all_start_methods()
+        else None
+    )
+    stats = ChunkStats()
+    begin = time.perf_counter()
+    with ProcessPoolExecutor(
+        workers, mp_context=context, initializer=get_game_data
+    ) as executor:
+        futures = [
+            executor.submit(run_chunk, start, min(chunk_size, lives - start), options)
+            for start in range(0, lives, chunk_size)
+        ]
+        for future in as_completed(futures):
+            stats.merge(future.result())
+            if progress:
+                elapsed = time.perf_counter() - begin
+                print(
+                    f"\r{stats.lives}/{lives} lives, {stats.lives / elapsed:.0f}/s",
+                    end="",
+                    file=sys.stderr,
+                    flush=True,
+                )
+    if progress:
+        print(file=sys.stderr)
+    return stats, time.perf_counter() - begin
+
+
+def judge_distribution(judges: Counter, grades: Sequence, lives: int) -> dict:
+    return {g.judge: judges[g.judge] / lives for g in grades if judges[g.judge]}
+
+
+def report(stats: ChunkStats, elapsed: float, workers: int) -> dict:
+    talents = get_game_data().talents_by_id
+    return {
+        "lives": stats.lives,
+        "workers": workers,
+        "seconds": round(elapsed, 3),
+        "lives_per_second": round(stats.lives / elapsed, 1),
+        "lives_per_second_per_core": round(stats.lives / stats.seconds, 1),
+        "mean_years": round(stats.years / stats.lives, 2),
+        "mean_age": round(stats.age_sum / stats.lives, 2),
+        "mean_sum": round(stats.sum_sum / stats.lives, 2),
+        "age": judge_distribution(
+            stats.age_judges, AGESummary(0).grades(), stats.lives
+        ),
+        "sum": judge_distribution(
+            stats.sum_judges, SUMSummary(0).grades(), stats.lives
+        ),
+        "talents": {
+            f"{i} {talents[i].name}": {
+                "lives": n,
+                "trigger_rate": round(stats.talent_hits[i] / n, 4),
+            }
+            for i, n in sorted(stats.talent_lives.items())
+        },
+    }
+
+
+def print_report(result: dict):
+    print(
+        f"{result['lives']} lives in {result['seconds']}s with {result['workers']} "
+        f"workers: {result['lives_per_second']} lives/s, "
+        f"{result['lives_per_second_per_core']} lives/s per core"
+    )
+    print(f"mean age {result['mean_age']}, mean SUM {result['mean_sum']}")
+    for key, title in (("age", "享年"), ("sum", "总评")):
+        print(f"\n{title}:")
+        for judge, rate in result[key].items():
+            print(f"  {judge:<6}{rate:8.2%}")
+    print("\n天赋发动率:")
+    for name, item in result["talents"].items():
+        print(f"  {name:<16}{item['trigger_rate']:8.2%}  ({item['lives']} lives)")
+
+
+def parse_ints(value: str) -> tuple[int, ...]:
+    return tuple(int(x) for x in value.replace(",", " ").split())
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(
+        prog="python -m nonebot_plugin_remake.simulate",
+        description="多进程批量模拟人生重开",
+    )
+    parser.add_argument("-n", "--lives", type=int, default=10000, help="人生数量")
+    parser.add_argument(
+        "-j", "--workers", type=int, default=os.cpu_count() or 1, help="进程数"
+    )
+    parser.add_argument("--chunk", type=int, default=500, help="每批人生数量")
+    parser.add_argument("--seed", type=int, default=0, help="起始种子")
+    parser.add_argument("--talents", type=parse_ints, help="天赋 id，如 1023,1141")
+    parser.add_argument("--props", type=parse_ints, help="颜值 智力 体质 家境")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    args = parser.parse_args(argv)
+
+    for name in ("lives", "workers", "chunk"):
+        if getattr(args, name) <= 0:
+            parser.error(f"--{name} must be positive")
+    if args.props is not None and len(args.props) != 4:
+        parser.error("--props requires 4 numbers")
+    if args.talents is not None:
+        unknown = set(args.talents) - set(get_game_data().talents_by_id)
+        if unknown:
+            parser.error(f"unknown talents: {sorted(unknown)}")
+    options = SimulateOptions(args.talents, args.props, args.seed)
+
+    stats, elapsed = simulate(
+        args.lives, options, args.workers, args.chunk, progress=not args.json
+    )
+    result = report(stats, elapsed, args.workers)
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    else:
+        print_report(result)
+
+
+if __name__ == "__main__":
+    main()
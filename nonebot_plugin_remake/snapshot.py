@@ -0,0 +1,148 @@
+import argparse
+import hashlib
+import json
+import marshal
+import os
+from array import array
+from pathlib import Path
+from typing import Any, Optional
+
+from nonebot.log import logger
+
+from .event import WeightedEvent
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_NAME = "data.snapshot"
+SOURCE_FILES = ("age.json", "events.json", "talents.json")
+
+# {"ages": {年龄: (事件 id 数组, 权重数组)}, "events": {...}, "talents": {...}}
+RawData = dict[str, Any]
+
+
+def source_digest(path: Path) -> str:
+    digest = hashlib.sha256()
+    for name in SOURCE_FILES:
+        digest.update((path / name).read_bytes())
+    return digest.hexdigest()
+
+
+def build_snapshot(path: Path) -> RawData:
+    """从 JSON 构建快照数据，年龄表预先拆分为事件 id 和权重两个数组"""
+
+    def load_json(name: str) -> dict:
+        with (path / name).open("r", encoding="utf8") as f:
+            return json.load(f)
+
+    ages: dict[int, tuple[array, array]] = {}
+    for k, v in load_json("age.json").items():
+        events = [WeightedEvent.parse(s) for s in v.get("event", [])]
+        ages[int(k)] = (
+            array("i", [e.event_id for e in events]),
+            array("d", [e.weight for e in events]),
+        )
+    return {
+        "ages": ages,
+        "events": load_json("events.json"),
+        "talents": load_json("talents.json"),
+    }
+
+
+def read_snapshot(file: Path, digest: str) -> Optional[RawData]:
+    try:
+        with file.open("rb") as f:
+            version, file_digest, raw = marshal.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, EOFError, ValueError, TypeError):
+        logger.warning(f"Failed to read snapshot {file}, rebuilding")
+        return None
+    if version != SNAPSHOT_VERSION or file_digest != digest:
+        return None
+
+    ages: dict[int, tuple[array, array]] = {}
+    for age, (ids_bytes, weights_bytes) in raw["ages"].items():
+        ids = array("i")
+        ids.frombytes(ids_bytes)
+        weights = array("d")
+        weights.frombytes(weights_bytes)
+        ages[age] = (ids, weights)
+    raw["ages"] = ages
+    return raw
+
+
+def write_snapshot(file: Path, digest: str, raw: RawData) -> bool:
+    """写入快照，目录不可写时返回 False"""
+    encoded = dict(raw)
+    encoded["ages"] = {
+        age: (ids.tobytes(), weights.tobytes())
+        for age, (ids, weights) in raw["ages"].items()
+    }
+    tmp_file = file.with_name(f"{file.name}.{os.getpid()}.tmp")
+    try:
+        file.parent.mkdir(parents=True, exist_ok=True)
+        with tmp_file.open("wb") as f:
+            marshal.dump((SNAPSHOT_VERSION, digest, encoded), f)
+        os.replace(tmp_file, file)
+    except OSError:
+        logger.debug(f"Failed to write snapshot {file}")
+        tmp_file.unlink(missing_ok=True)
+        return False
+    return True
+
+
+def cache_dir() -> Path:
+    """安装目录不可写时存放快照的目录，可以用环境变量 REMAKE_CACHE_DIR 指定"""
+    if env := os.environ.get("REMAKE_CACHE_DIR"):
+        return Path(env)
+    if os.name == "nt" and (base := os.environ.get("LOCALAPPDATA")):
+        return Path(base) / "nonebot_plugin_remake"
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "nonebot_plugin_remake"
+
+
+def snapshot_files(path: Path) -> list[Path]:
+    """依次查找的快照：随包安装或预先生成的，用户缓存目录中的"""
+    return [path / SNAPSHOT_NAME, cache_dir() / SNAPSHOT_NAME]
+
+
+def load_raw_data(path: Path, snapshot_file: Optional[Path] = None) -> RawData:
+    """优先读取与 JSON 内容哈希匹配的快照，否则解析 JSON 并重新生成快照
+
+    没有指定 snapshot_file 时先写入数据目录，不可写时写入缓存目录
+    """
+    files = [snapshot_file] if snapshot_file else snapshot_files(path)
+    digest = source_digest(path)
+    for file in files:
+        if (raw := read_snapshot(file, digest)) is not None:
+            return raw
+    raw = build_snapshot(path)
+    if not any(write_snapshot(file, digest, raw) for file in files):
+        logger.warning(
+            f"Failed to write snapshot to {', '.join(map(str, files))}, using JSON data"
+        )
+    return raw
+
+
+def main(argv: Optional[list[str]] = None):
+    from .data import data_path
+
+    parser = argparse.ArgumentParser(
+        description="预先生成数据快照，打包前或安装目录只读时使用"
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=Path,
+        default=data_path / SNAPSHOT_NAME,
+        help="快照文件，默认为随包安装的数据目录下的 data.snapshot",
+    )
+    args = parser.parse_args(argv)
+
+    digest = source_digest(data_path)
+    if not write_snapshot(args.output, digest, build_snapshot(data_path)):
+        parser.error(f"cannot write {args.output}")
+    print(f"Wrote snapshot {args.output} ({args.output.stat().st_size} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,10 @@
-import json
+import itertools
 import random
-from collections.abc import Iterator
-from pathlib import Path
+from collections.abc import Iterator, Sequence
+from typing import Optional
 
-from .property import Property
-from .utils import parse_condition
+from .condition import ALWAYS, parse_condition
+from .property import NO_EFFECT, Property, compile_effect
 
 
 class Talent:
@@ -16,12 +16,10 @@ class Talent:
         self.exclusive: list[int] = (
             [int(x) for x in data["exclusive"]] if "exclusive" in data else []
         )
-        self.effect: dict[str, int] = data["effect"] if "effect" in data else {}
+        self.effect = compile_effect(data["effect"]) if "effect" in data else NO_EFFECT
         self.status = int(data["status"]) if "status" in data else 0
         self.condition = (
-            parse_condition(data["condition"])
-            if "condition" in data
-            else lambda _: True
+            parse_condition(data["condition"]) if "condition" in data else ALWAYS
         )
 
     def __str__(self) -> str:
@@ -31,34 +29,50 @@ class Talent:
         return talent.id in self.exclusive or self.id in talent.exclusive
 
     def check_condition(self, prop: Property) -> bool:
-        return self.condition(prop)
+        return self.condition.check(prop)
 
     def run(self, prop: Property) -> list[str]:
         if self.check_condition(prop):
             prop.apply(self.effect)
-            prop.TLT.add(self.id)
+            prop.add("TLT", self.id)
             return [f"天赋【{self.name}】发动：{self.description}"]
         return []
 
 
+def conflict_talents(talents: Sequence[Talent]) -> Optional[tuple[Talent, Talent]]:
+    for t1, t2 in itertools.combinations(talents, 2):
+        if t1.exclusive_with(t2):
+            return t1, t2
+    return None
+
+
+GRADE_COUNT = 4
+
+
+def load_talents(data: dict[str, dict]) -> dict[int, tuple[Talent, ...]]:
+    talent_list: list[Talent] = [Talent(data) for data in data.values()]
+    return {
+        i: tuple(t for t in talent_list if t.grade == i) for i in range(GRADE_COUNT)
+    }
+
+
 class TalentManager:
-    def __init__(self, prop: Property):
+    def __init__(
+        self,
+        prop: Property,
+        talent_dict: dict[int, tuple[Talent, ...]],
+        rng: random.Random,
+    ):
         self.prop = prop
+        self.rng = rng
         self.talents: list[Talent] = []
-        self.talent_dict: dict[int, list[Talent]] = {}
-        self.grade_count = 4
+        self.talent_dict = talent_dict
+        self.grade_count = GRADE_COUNT
         self.grade_prob = [0.889, 0.1, 0.01, 0.001]
 
-    def load(self, path: Path):
-        data: dict = json.load(path.open("r", encoding="utf8"))
-        talent_list: list[Talent] = [Talent(data) for data in data.values()]
-        self.talent_dict = {
-            i: [t for t in talent_list if t.grade == i] for i in range(self.grade_count)
-        }
-
     def rand_talents(self, count: int) -> Iterator[Talent]:
         def rand_grade():
-            rnd = random.random()
+            rnd = self.rng.random()
             result = self.grade_count
             while rnd > 0:
                 result -= 1
@@ -74,7 +88,7 @@ class TalentManager:
             if count > n:
                 counts[grade - 1] += count - n
                 count = n
-            yield from random.sample(self.talent_dict[grade], k=count)
+            yield from self.rng.sample(self.talent_dict[grade], k=count)
 
     def update_talent_prop(self):
         self.prop.total += sum(t.status for t in self.talents)